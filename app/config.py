@@ -10,8 +10,107 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 1.0
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures before Redis is skipped
+    REDIS_BREAKER_RESET_SECONDS: float = 30.0
+
+    # Shared upstream HTTP client
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection stays open
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP2_ENABLED: bool = False  # Requires the optional "h2" package
+    HTTP_WARMUP_CONNECTIONS: int = 2  # Connections opened at startup, 0 to disable
+
+    # Retries of idempotent upstream reads (GraphQL queries)
+    UPSTREAM_RETRY_ATTEMPTS: int = 4  # Attempts per upstream call, including the first
+    UPSTREAM_RETRY_BUDGET: int = 10  # Retries one API request may spend across all its upstream calls
+    UPSTREAM_RETRY_BASE_SECONDS: float = 0.5  # First backoff ceiling, doubled on every retry
+    UPSTREAM_RETRY_MAX_SECONDS: float = 30.0  # Longest single wait, also caps Retry-After
+
+    # Upstream rate limit per API key, shared by all workers through Redis
+    UPSTREAM_RATE_LIMIT_PER_SECOND: float = 10.0  # Sustained requests per second, 0 to disable
+    UPSTREAM_RATE_LIMIT_BURST: int = 20  # Requests allowed at once after an idle period
+
+    # Budget hours/costs/progress chunk queries running at once per budget fetch
+    BUDGET_FETCH_WORKERS: int = 8
+    # Chunks whose hours, costs and progress share one aliased query, 0 for one query each
+    BUDGET_BATCH_CHUNKS: int = 2
+
+    # How projects are read upstream: "nested" asks for roots with six levels of
+    # children, "flat" pages through every project and assembles the trees
+    # locally, with predictable page sizes and no depth limit
+    PROJECT_FETCH_STRATEGY: str = "nested"
+
+    # Upstream pages fetched ahead while earlier pages are being transformed
+    PIPELINE_PREFETCH_PAGES: int = 1
+
+    # Cache freshness: entries are fresh until the soft TTL, then served stale
+    # while a background refresh runs, and dropped at the hard TTL
+    ACTIVE_CACHE_SOFT_MINUTES: int = 10
+    ACTIVE_CACHE_HARD_MINUTES: int = 60
+    ARCHIVE_CACHE_SOFT_MINUTES: int = 720
+    ARCHIVE_CACHE_HARD_MINUTES: int = 1440
+
+    # Cache payload encoding
+    CACHE_SERIALIZER: str = "orjson"  # orjson, or msgpack (requires the "msgpack" package)
+    CACHE_COMPRESSION: str = "gzip"  # none, gzip, or zstd (requires the "zstandard" package)
+    CACHE_COMPRESSION_LEVEL: Optional[int] = None  # Codec default (gzip 1, zstd 3) when unset
+    CACHE_DECODE_THREAD_MIN_BYTES: int = 64 * 1024  # Larger payloads are decoded off the event loop
+
+    # Pre-compressed full responses stored next to the cached data
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_BROTLI_QUALITY: int = 5  # Brotli requires the "brotli" package
+
+    # In-process tier in front of Redis holding decoded payloads; kept consistent
+    # across workers through Redis pub/sub invalidation
+    LOCAL_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # Serialized size, 0 to disable
+    LOCAL_CACHE_TTL_SECONDS: int = 60  # Upper bound on how long a local copy is trusted
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+
+    # Tenant cache namespaces: keys carry a salted hash of the API key
+    CACHE_KEY_SALT: str = ""  # Set to a long random secret, identical on every worker
+    TENANT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # Per-tenant quota, 0 for no limit
+    CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # Across all tenants, 0 for no limit
+    # JSON object of per-tenant TTL/quota overrides keyed by fingerprint, e.g.
+    # {"<fingerprint>": {"active_soft_minutes": 5, "active_hard_minutes": 30, "max_bytes": 1048576}}
+    TENANT_CACHE_OVERRIDES: str = ""
+
+    # Incremental sync: raw upstream records are kept per tenant and refreshed
+    # with only the records changed since the newest updatedOn seen
+    DELTA_SYNC_ENABLED: bool = False  # Opt-in: nested projectInfo edits may not move updatedOn
+    DELTA_SNAPSHOT_HOURS: int = 48  # How long an unused snapshot is kept
+    DELTA_FULL_SYNC_HOURS: int = 24  # Full crawl interval, picks up hard deletes
+
+    # Background cache warming: entries of the listed tenants are refreshed
+    # shortly before their soft TTL, so requests find a warm cache
+    CACHE_WARM_API_KEYS: str = ""  # Comma-separated API keys, empty to disable
+    CACHE_WARM_DATASETS: str = "projects,budgets,employees,cost_codes,equipment"
+    CACHE_WARM_ARCHIVED: bool = True  # Also warm archived (deleted equipment) data, after active data
+    CACHE_WARM_CONCURRENCY: int = 2  # Refreshes running at once per worker
+    CACHE_WARM_LEAD_SECONDS: int = 120  # How long before the soft TTL an entry is refreshed
+    CACHE_WARM_JITTER_SECONDS: int = 60  # Random extra lead that spreads tenants apart
+    CACHE_WARM_MIN_INTERVAL_SECONDS: int = 60  # Shortest time between checks, also the retry delay
+
+    # Background export jobs (POST /api/jobs/{dataset})
+    JOB_CONCURRENCY: int = 4  # Jobs running at once per worker, later ones wait queued
+    JOB_TIMEOUT_SECONDS: int = 3600
+    JOB_RESULT_MINUTES: int = 60  # How long job status and results stay readable
+    JOB_HEARTBEAT_SECONDS: int = 10  # Running jobs refresh their status this often
+
+    # Cursor pagination of our own endpoints
+    PAGE_DEFAULT_LIMIT: int = 1000
+    PAGE_MAX_LIMIT: int = 10000
+    PAGE_SNAPSHOT_MINUTES: int = 30  # How long a paginated result stays readable
+
+    # Single-flight coalescing of identical cache misses
+    SINGLE_FLIGHT_LOCK_SECONDS: int = 15  # Lock TTL, refreshed while the fetch runs
+    SINGLE_FLIGHT_WAIT_SECONDS: int = 300  # Max time a follower waits for the leader
+    SINGLE_FLIGHT_POLL_INTERVAL: float = 0.5
 
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
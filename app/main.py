@@ -1,25 +1,57 @@
-from fastapi import FastAPI, HTTPException, Header, Query
+from fastapi import FastAPI, HTTPException, Header, Query, Depends, Request
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, ORJSONResponse, Response
 from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Optional, List
+from typing import Awaitable, Callable, Optional, List, Tuple
 from .services.project_service import ProjectService
 from .services.budget_service import BudgetService
 from .services.employee_service import EmployeeService
 from .services.cost_code_service import CostCodeService
 from .services.equipment_service import EquipmentService
+from .services.cache_warmer import start_cache_warmer, stop_cache_warmer
+from .services.export_jobs import stop_export_jobs
+from .routers import jobs
+from .utils.http_client import start_http_client, close_http_client, get_http_client
+from .utils.redis_cache import (
+    start_redis_pool, close_redis_pool, start_cache_invalidation, stop_cache_invalidation
+)
+from .utils.cache_codec import cache_codec
+from .utils.response_cache import ResponseBodyCache, etag_matches, not_modified
+from .utils.tenant_cache import tenant_ttl_minutes
+from .utils.pagination import SnapshotPaginator, InvalidPageToken, PageTokenExpired, SnapshotUnavailable
+from .utils.response_formats import (
+    FORMAT_PATTERN, STREAMING_FORMATS, TABLE_FORMAT, streaming_response, iter_batches, to_table, format_page
+)
+import httpx
 import logging
 import asyncio
 import json
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pytz import timezone
 from .config import settings
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared upstream resources for the lifetime of the worker"""
+    await start_http_client()
+    await start_redis_pool()
+    await start_cache_invalidation()
+    await start_cache_warmer()
+    yield
+    await stop_export_jobs()
+    await stop_cache_warmer()
+    await stop_cache_invalidation()
+    await close_redis_pool()
+    await close_http_client()
+
 app = FastAPI(
     title="BusyBusy API",
     description="API for BusyBusy Project Management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -30,16 +62,95 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.add_middleware(GZipMiddleware, minimum_size=1000)  # Compress responses > 1000 bytes
+app.include_router(jobs.router)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to FastAPI"}
 
+@app.get("/api/cache/metrics")
+async def cache_metrics():
+    """Cache payload codec metrics of this worker"""
+    return {
+        "serializer": cache_codec.serializer,
+        "compression": cache_codec.compression,
+        **cache_codec.metrics.snapshot()
+    }
+
+async def _first_page(dataset: str, api_key: str, rows: List[dict], limit: Optional[int], format: str):
+    """Return all rows, or snapshot them and return the first page when a limit is given"""
+    # Responses are returned directly so FastAPI skips jsonable_encoder on large row lists
+    if limit is None:
+        return ORJSONResponse(to_table(rows) if format == TABLE_FORMAT else rows)
+    try:
+        page = await SnapshotPaginator(api_key, dataset).create(rows, limit)
+    except SnapshotUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return ORJSONResponse(format_page(page, format))
+
+async def _full_response(request: Request, service, api_key: str, is_archived: bool, variant: str,
+                         fetch: Callable[[], Awaitable[Tuple[List[dict], Optional[str]]]],
+                         format: str) -> Response:
+    """Return the complete result, reusing the stored compressed body while the cached data is unchanged.
+
+    A matching If-None-Match is answered with 304 from the cached data's
+    version alone, without running the service pipeline. fetch returns the
+    rows with the version they were read from, and the body and its ETag
+    are keyed on that version, never on a later read that a refresh may
+    have moved on.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    body_cache = ResponseBodyCache(
+        service.cache_key(api_key, is_archived),
+        variant,
+        request.headers.get("accept-encoding"),
+        tenant_ttl_minutes(api_key, is_archived)[1]
+    )
+    version = await service.cached_version(api_key, is_archived)
+    if version and etag_matches(if_none_match, body_cache.etag(version)):
+        return not_modified(body_cache.etag(version))
+
+    cached_response = await body_cache.get(version)
+    if cached_response is not None:
+        return cached_response
+
+    rows, version = await fetch()
+    rows = rows or []
+    payload = to_table(rows) if format == TABLE_FORMAT else rows
+    response = await body_cache.build(version, payload)
+    if etag_matches(if_none_match, response.headers["etag"]):
+        return not_modified(response.headers["etag"])
+    return response
+
+def _check_format(format: str, limit: Optional[int], page_token: Optional[str]) -> None:
+    """Streaming formats send everything in one response and cannot be paginated"""
+    if format in STREAMING_FORMATS and (limit is not None or page_token):
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit/page_token cannot be combined with format={format}"
+        )
+
+async def _next_page(dataset: str, api_key: str, page_token: str, limit: Optional[int], format: str):
+    """Serve a later page straight from its snapshot, without calling the service"""
+    try:
+        paginator = SnapshotPaginator(api_key, dataset)
+        page = await paginator.get_page(page_token, limit or settings.PAGE_DEFAULT_LIMIT)
+        return ORJSONResponse(format_page(page, format))
+    except PageTokenExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidPageToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/projects")
 async def get_projects(
+    request: Request,
     is_archived: bool = Query(...),
     timezone: str = Query(...),
-    api_key: str = Header(..., alias="key-authorization")
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    page_token: Optional[str] = Query(None),
+    format: str = Query("json", pattern=FORMAT_PATTERN),
+    api_key: str = Header(..., alias="key-authorization"),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     try:
         if not api_key or len(api_key) < 20:  # Basic validation
@@ -54,48 +165,83 @@ async def get_projects(
                 detail="Timezone must be in GMT format (e.g. GMT+05:30)"
             )
 
-        service = ProjectService()
+        _check_format(format, limit, page_token)
+        if page_token:
+            return await _next_page("projects", api_key, page_token, limit, format)
+
+        service = ProjectService(client)
+        if format in STREAMING_FORMATS:
+            return await streaming_response(format, service.stream_rows(api_key, is_archived, timezone))
+
+        if limit is None:
+            return await _full_response(
+                request, service, api_key, is_archived, f"{format}:{timezone}",
+                lambda: service.fetch_with_version(api_key, is_archived, timezone), format
+            )
+
         projects = await service.fetch_projects(api_key, is_archived, timezone)
         
-        if not projects:
-            return []
-            
-        return projects
+        return await _first_page("projects", api_key, projects or [], limit, format)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in get_projects")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/budgets")
 async def get_budgets(
+    request: Request,
     is_archived: bool = Query(...),
-    api_key: str = Header(..., alias="key-authorization")
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    page_token: Optional[str] = Query(None),
+    format: str = Query("json", pattern=FORMAT_PATTERN),
+    api_key: str = Header(..., alias="key-authorization"),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """Fetch budget data with timeout handling"""
     try:
         if not api_key or len(api_key) < 20:
             raise HTTPException(status_code=401, detail="Invalid API key format")
 
-        service = BudgetService()
+        _check_format(format, limit, page_token)
+        if page_token:
+            return await _next_page("budgets", api_key, page_token, limit, format)
+
+        service = BudgetService(client)
+        if limit is None and format not in STREAMING_FORMATS:
+            return await _full_response(
+                request, service, api_key, is_archived, format,
+                lambda: service.fetch_with_version(api_key, is_archived), format
+            )
+
         logging.info(f"Starting budget fetch. Archived: {is_archived}")
         
         budgets = await service.fetch_all_budgets(api_key, is_archived)
         logging.info(f"Fetched budget data")
+
+        # Budget rows are sorted across all projects, so they can only be streamed once complete
+        if format in STREAMING_FORMATS:
+            return await streaming_response(format, iter_batches(budgets or []))
         
-        if not budgets:
-            return []
-            
-        return budgets
+        return await _first_page("budgets", api_key, budgets or [], limit, format)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in get_budgets")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/employees")
 async def get_employees(
+    request: Request,
     is_archived: bool = Query(...),
     timezone: str = Query(...),
-    api_key: str = Header(..., alias="key-authorization")
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    page_token: Optional[str] = Query(None),
+    format: str = Query("json", pattern=FORMAT_PATTERN),
+    api_key: str = Header(..., alias="key-authorization"),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """Fetch employee data with timezone support"""
     try:
@@ -108,35 +254,57 @@ async def get_employees(
                 detail="Timezone must be in GMT format (e.g. GMT+05:30)"
             )
 
-        service = EmployeeService()
+        _check_format(format, limit, page_token)
+        if page_token:
+            return await _next_page("employees", api_key, page_token, limit, format)
+
+        service = EmployeeService(client)
+        if format in STREAMING_FORMATS:
+            # Streams make progress page by page, so they are not bound by the timeout below
+            return await streaming_response(format, service.stream_rows(api_key, is_archived, timezone))
+
         logging.info(f"Starting employee fetch. Archived: {is_archived}")
         
         # Add timeout
         timeout = 180  # 3 minutes
         try:
+            if limit is None:
+                return await _full_response(
+                    request, service, api_key, is_archived, f"{format}:{timezone}",
+                    lambda: asyncio.wait_for(service.fetch_with_version(api_key, is_archived, timezone), timeout=timeout),
+                    format
+                )
+
             employees = await asyncio.wait_for(
                 service.fetch_employees(api_key, is_archived, timezone), 
                 timeout=timeout
             )
             
             logging.info(f"Fetched {len(employees)} employee records")
-            return employees
+            return await _first_page("employees", api_key, employees, limit, format)
             
         except asyncio.TimeoutError:
             raise HTTPException(
                 status_code=504,
-                detail=f"Request timed out after {timeout} seconds"
+                detail=f"Request timed out after {timeout} seconds, use POST /api/jobs/employees to export it in the background"
             )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in get_employees")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/cost-codes")
 async def get_cost_codes(
+    request: Request,
     is_archived: bool = Query(...),
     timezone: str = Query(...),
-    api_key: str = Header(..., alias="key-authorization")
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    page_token: Optional[str] = Query(None),
+    format: str = Query("json", pattern=FORMAT_PATTERN),
+    api_key: str = Header(..., alias="key-authorization"),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """Fetch cost code data with timezone support"""
     try:
@@ -149,33 +317,55 @@ async def get_cost_codes(
                 detail="Timezone must be in GMT format (e.g. GMT+05:30)"
             )
 
-        service = CostCodeService()
+        _check_format(format, limit, page_token)
+        if page_token:
+            return await _next_page("cost-codes", api_key, page_token, limit, format)
+
+        service = CostCodeService(client)
+        if format in STREAMING_FORMATS:
+            # Streams make progress page by page, so they are not bound by the timeout below
+            return await streaming_response(format, service.stream_rows(api_key, is_archived, timezone))
+
         logging.info(f"Starting cost code fetch. Archived: {is_archived}")
         
         timeout = 180
         try:
+            if limit is None:
+                return await _full_response(
+                    request, service, api_key, is_archived, f"{format}:{timezone}",
+                    lambda: asyncio.wait_for(service.fetch_with_version(api_key, is_archived, timezone), timeout=timeout),
+                    format
+                )
+
             cost_codes = await asyncio.wait_for(
                 service.fetch_cost_codes(api_key, is_archived, timezone),
                 timeout=timeout
             )
             logging.info(f"Fetched {len(cost_codes)} cost code records")
-            return cost_codes
+            return await _first_page("cost-codes", api_key, cost_codes, limit, format)
             
         except asyncio.TimeoutError:
             raise HTTPException(
                 status_code=504,
-                detail=f"Request timed out after {timeout} seconds"
+                detail=f"Request timed out after {timeout} seconds, use POST /api/jobs/cost-codes to export it in the background"
             )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in get_cost_codes")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/equipment")
 async def get_equipment(
+    request: Request,
     is_deleted: bool = Query(...),
     timezone: str = Query(...),
-    api_key: str = Header(..., alias="key-authorization")
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    page_token: Optional[str] = Query(None),
+    format: str = Query("json", pattern=FORMAT_PATTERN),
+    api_key: str = Header(..., alias="key-authorization"),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """Fetch equipment data with timezone support"""
     try:
@@ -188,24 +378,41 @@ async def get_equipment(
                 detail="Timezone must be in GMT format (e.g. GMT+05:30)"
             )
 
-        service = EquipmentService()
+        _check_format(format, limit, page_token)
+        if page_token:
+            return await _next_page("equipment", api_key, page_token, limit, format)
+
+        service = EquipmentService(client)
+        if format in STREAMING_FORMATS:
+            # Streams make progress page by page, so they are not bound by the timeout below
+            return await streaming_response(format, service.stream_rows(api_key, is_deleted, timezone))
+
         logging.info(f"Starting equipment fetch. Deleted: {is_deleted}")
         
         timeout = 180
         try:
+            if limit is None:
+                return await _full_response(
+                    request, service, api_key, is_deleted, f"{format}:{timezone}",
+                    lambda: asyncio.wait_for(service.fetch_with_version(api_key, is_deleted, timezone), timeout=timeout),
+                    format
+                )
+
             equipment = await asyncio.wait_for(
                 service.fetch_equipment(api_key, is_deleted, timezone),
                 timeout=timeout
             )
             logging.info(f"Fetched {len(equipment)} equipment records")
-            return equipment
+            return await _first_page("equipment", api_key, equipment, limit, format)
             
         except asyncio.TimeoutError:
             raise HTTPException(
                 status_code=504,
-                detail=f"Request timed out after {timeout} seconds"
+                detail=f"Request timed out after {timeout} seconds, use POST /api/jobs/equipment to export it in the background"
             )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in get_equipment")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, HTTPException, Header, Path, Query, Depends, Request
+from fastapi.responses import ORJSONResponse, Response
+from typing import Optional
+import asyncio
+import gzip
+import httpx
+import logging
+from ..services.export_jobs import (
+    EXPORT_DATASETS, JOB_SUCCEEDED, ExportJobService, JobNotFinished, JobNotFound
+)
+from ..utils.http_client import get_http_client
+from ..utils.response_cache import GZIP_ENCODING, accepts_encoding
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+DATASET_PATTERN = f"^({'|'.join(EXPORT_DATASETS)})$"
+
+
+def _with_links(job: dict) -> dict:
+    job = {**job, "status_url": f"/api/jobs/{job['id']}"}
+    if job["status"] == JOB_SUCCEEDED:
+        job["result_url"] = f"/api/jobs/{job['id']}/result"
+    return job
+
+
+@router.post("/{dataset}", status_code=202)
+async def create_job(
+    dataset: str = Path(..., pattern=DATASET_PATTERN),
+    is_archived: Optional[bool] = Query(None),
+    is_deleted: Optional[bool] = Query(None),
+    timezone: Optional[str] = Query(None),
+    format: str = Query("json", pattern="^(json|table)$"),
+    api_key: str = Header(..., alias="key-authorization"),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """Start exporting a dataset in the background; poll the returned job for its result"""
+    if not api_key or len(api_key) < 20:
+        raise HTTPException(status_code=401, detail="Invalid API key format")
+
+    # Equipment is filtered on deletion, everything else on archiving
+    flag_name = "is_deleted" if dataset == "equipment" else "is_archived"
+    flag = is_deleted if dataset == "equipment" else is_archived
+    if flag is None:
+        raise HTTPException(status_code=400, detail=f"{flag_name} is required for {dataset}")
+
+    if dataset != "budgets" and not (timezone and timezone.startswith("GMT")):
+        raise HTTPException(
+            status_code=400,
+            detail="Timezone must be in GMT format (e.g. GMT+05:30)"
+        )
+
+    try:
+        job = await ExportJobService(client).create(api_key, dataset, flag, timezone, format)
+    except Exception as e:
+        logging.exception("Error in create_job")
+        raise HTTPException(status_code=503, detail=str(e))
+
+    job = _with_links(job)
+    return ORJSONResponse(job, status_code=202, headers={"Location": job["status_url"]})
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    api_key: str = Header(..., alias="key-authorization"),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """Status and progress of an export job"""
+    try:
+        return _with_links(await ExportJobService(client).get(api_key, job_id))
+    except JobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(
+    request: Request,
+    job_id: str,
+    api_key: str = Header(..., alias="key-authorization"),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """Result of a finished export job, in the format it was requested in"""
+    try:
+        body = await ExportJobService(client).result(api_key, job_id)
+    except JobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except JobNotFinished as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if accepts_encoding(request.headers.get("accept-encoding"), GZIP_ENCODING):
+        return Response(content=body, media_type="application/json",
+                        headers={"Content-Encoding": GZIP_ENCODING, "Vary": "Accept-Encoding"})
+    # Decompressing a full export would block the event loop
+    body = await asyncio.to_thread(gzip.decompress, body)
+    return Response(content=body, media_type="application/json", headers={"Vary": "Accept-Encoding"})
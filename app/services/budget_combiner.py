@@ -0,0 +1,106 @@
+from typing import Dict, List, Tuple
+
+
+class BudgetCombiner:
+    """Combine budget hours, costs and progress per project in linear time.
+
+    Records are indexed once by (projectId, costCodeId) as they are added,
+    so combine() only does dictionary lookups per project instead of
+    scanning every record list. Records can be added in several calls
+    (e.g. one per chunk); the first record seen for a key wins, exactly
+    like the previous next(...) scans over the concatenated lists.
+    """
+
+    def __init__(self):
+        self._project_hours: Dict[str, float] = {}
+        self._project_costs: Dict[str, float] = {}
+        self._hours: Dict[Tuple[str, str], Dict] = {}
+        self._costs: Dict[Tuple[str, str], Dict] = {}
+        self._progress: Dict[Tuple[str, str], Dict] = {}
+        # Cost codes with a progress value or quantity, per project, in first-seen order
+        self._progress_cost_codes: Dict[str, Dict[str, None]] = {}
+
+    def add_hours(self, hours: List[Dict]) -> None:
+        for h in hours:
+            proj_id = h.get('projectId')
+            cc_id = h.get('costCodeId')
+            if not cc_id:
+                self._project_hours[proj_id] = (
+                    self._project_hours.get(proj_id, 0) + h.get('budgetSeconds', 0) / 3600
+                )
+            else:
+                self._hours.setdefault((proj_id, cc_id), h)
+
+    def add_costs(self, costs: List[Dict]) -> None:
+        for c in costs:
+            proj_id = c.get('projectId')
+            cc_id = c.get('costCodeId')
+            if not cc_id:
+                self._project_costs[proj_id] = (
+                    self._project_costs.get(proj_id, 0) + float(c.get('costBudget', 0) or 0)
+                )
+            else:
+                self._costs.setdefault((proj_id, cc_id), c)
+
+    def add_progress(self, progress: List[Dict]) -> None:
+        for prog in progress:
+            proj_id = prog.get('projectId')
+            cc_id = prog.get('costCodeId')
+            if not cc_id:
+                continue
+            self._progress.setdefault((proj_id, cc_id), prog)
+            if prog.get('value') or prog.get('quantity'):
+                self._progress_cost_codes.setdefault(proj_id, {})[cc_id] = None
+
+    def combine(self, cost_codes: List[Dict], project_info: Dict[str, Dict]) -> List[Dict]:
+        """Build one row per project plus one per cost code with progress data"""
+        combined_data = []
+        cost_code_map = {cc['id']: cc for cc in cost_codes}
+
+        for proj_id, proj_data in project_info.items():
+            status = 'Archived' if proj_data.get('archivedOn') else 'Active'
+
+            # Base project entry (without cost codes)
+            combined_data.append({
+                'id': '',
+                'project_id': proj_id,
+                'project_title': proj_data['title'],
+                'cost_code_id': None,
+                'cost_code_title': '',
+                'labor_hours': self._project_hours.get(proj_id, 0),
+                'labor_cost': self._project_costs.get(proj_id, 0),
+                'progress_value': 0,
+                'quantity': 0,
+                'status': status
+            })
+
+            # Entries for each cost code that has progress values or quantities
+            for cc_id in self._progress_cost_codes.get(proj_id, {}):
+                cost_code = cost_code_map.get(cc_id)
+                if cost_code is None:
+                    continue
+
+                key = (proj_id, cc_id)
+                cc_progress = self._progress[key]
+                cc_hours = self._hours.get(key, {})
+                cc_costs = self._costs.get(key, {})
+
+                combined_data.append({
+                    'id': cc_progress.get('id', ''),
+                    'project_id': proj_id,
+                    'project_title': proj_data['title'],
+                    'cost_code_id': cc_id,
+                    'cost_code_title': f"{cost_code.get('costCode', '')} {cost_code.get('title', '')}".strip(),
+                    'labor_hours': cc_hours.get('budgetSeconds', 0) / 3600 if cc_hours.get('budgetSeconds') is not None else 0,
+                    'labor_cost': float(cc_costs.get('costBudget', 0) or 0),
+                    'progress_value': float(cc_progress.get('value', 0) or 0),
+                    'quantity': float(cc_progress.get('quantity', 0) or 0),
+                    'status': status
+                })
+
+        # Sort by project title and cost code
+        def sort_key(item):
+            parts = item['project_title'].split(' / ')
+            return tuple([p.lower() for p in parts] + [item.get('cost_code_title', '').lower()])
+
+        return sorted(combined_data, key=sort_key)
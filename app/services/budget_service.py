@@ -1,16 +1,57 @@
 import httpx
 import asyncio
 import logging
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict
 from datetime import datetime
 from ..config import settings
 from ..models.budget import BudgetHours, BudgetCost, ProgressBudget, CostCode
 from ..utils.redis_cache import RedisCache
-
-
-class BudgetService:
-    def __init__(self):
+from ..utils.cached_dataset import CachedDataset
+from ..utils.http_client import get_http_client
+from ..utils.retry import RetryBudget, post_with_retry
+from ..utils.serialization import loads
+from ..utils.work_scheduler import WorkScheduler
+from .budget_combiner import BudgetCombiner
+
+# Budget records fetched per project chunk, in fetch order: root field, filter and
+# sort input types, selected fields and the filter applied next to the project ids
+BUDGET_RECORD_QUERIES = {
+    "progress": {
+        "field": "progressBudgets",
+        "filter_type": "ProgressBudgetFilter",
+        "sort_type": "ProgressBudgetSort",
+        "selection": "id cursor quantity value projectId costCodeId",
+        "filter": {"deletedOn": {"isNull": True}},
+    },
+    "hours": {
+        "field": "budgetHours",
+        "filter_type": "BudgetHoursFilter",
+        "sort_type": "BudgetHoursSort",
+        "selection": "id projectId memberId budgetSeconds costCodeId equipmentId createdOn cursor equipmentBudgetSeconds",
+        "filter": {"isLatest": {"equal": True}},
+    },
+    "costs": {
+        "field": "budgetCosts",
+        "filter_type": "BudgetCostFilter",
+        "sort_type": "BudgetCostSort",
+        "selection": "id projectId memberId costBudget costCodeId equipmentId cursor equipmentCostBudget",
+        "filter": {"isLatest": {"equal": True}},
+    },
+}
+
+
+class GraphQLError(Exception):
+    pass
+
+
+class BudgetService(CachedDataset):
+    cache_name = "budget_data"
+    dataset_label = "budgets"
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.url = settings.BUSYBUSY_GRAPHQL_URL
+        self.client = client or get_http_client()
+        self.retry_budget = RetryBudget()
         self.batch_size = 500
         self.chunk_size = 100
         self.cache = RedisCache()
@@ -35,99 +76,94 @@ class BudgetService:
 
     async def fetch_all_budgets(self, api_key: str, is_archived: bool) -> List[Dict]:
         """Fetch budget data with caching"""
-        cache_key = f"budget_data_{'archive' if is_archived else 'active'}"
-        
-        # Try to get from cache first
-        cached_data = await self.cache.get_cached_data(cache_key)
-        if cached_data:
-            logging.info(f"Using cached budget data for {cache_key}")
-            return cached_data
-
-        try:
-            # Fetch projects first
-            projects_data = await self._fetch_budget_projects(api_key, is_archived)
-            if not projects_data:
-                logging.debug("No projects data found for budgets.")
-                return []
-
-            # Store project hierarchy info 
-            project_info = {}
-            for project in projects_data:
-                ancestors = project.get('ancestors', [])
-                project_title = self._build_project_title(project, ancestors)
-                project_info[project['id']] = {
-                    'title': project_title,
-                    'archivedOn': project.get('archivedOn'),
-                    'ancestors': ancestors
-                }
-
-            # Get project IDs and split into chunks
-            project_ids = list(project_info.keys())
-            chunks = [project_ids[i:i + self.chunk_size] 
-                     for i in range(0, len(project_ids), self.chunk_size)]
-
-            # Process chunks concurrently
-            hours_tasks = [self._fetch_budget_hours_chunk(api_key, chunk) for chunk in chunks]
-            costs_tasks = [self._fetch_budget_costs_chunk(api_key, chunk) for chunk in chunks]
-            progress_tasks = [self._fetch_progress_budgets_chunk(api_key, chunk) for chunk in chunks]
-
-            # Gather all results
-            hours_chunks, costs_chunks, progress_chunks = await asyncio.gather(
-                asyncio.gather(*hours_tasks),
-                asyncio.gather(*costs_tasks),
-                asyncio.gather(*progress_tasks)
-            )
-
-            # Combine chunk results
-            hours = [item for chunk in hours_chunks for item in chunk]
-            costs = [item for chunk in costs_chunks for item in chunk]
-            progress = [item for chunk in progress_chunks for item in chunk]
-
-            # Get cost codes
-            cost_code_ids = {pb.get('costCodeId') for pb in progress if pb.get('costCodeId')}
-            cost_codes = await self._fetch_cost_codes(api_key, list(cost_code_ids)) if cost_code_ids else []
-
-            # Format and return data without timezone conversion
-            formatted_data = self._combine_hierarchical_data(hours, costs, progress, cost_codes, project_info)
-
-            # Ensure data is JSON-serializable
-            for item in formatted_data:
-                for key, value in item.items():
-                    if isinstance(value, datetime):
-                        item[key] = value.isoformat()
-
-            # Cache the results
-            cache_minutes = 720 if is_archived else 10  # 12 hours for archived, 10 minutes for active
-            await self.cache.set_cached_data(cache_key, formatted_data, cache_minutes)
-
-            logging.debug(f"Formatted budget data: {formatted_data}")
-            return formatted_data
-
-        except Exception as e:
-            logging.error(f"Error fetching budgets: {str(e)}", exc_info=True)
-            raise
+        budgets, _ = await self.fetch_with_version(api_key, is_archived)
+        return budgets
+
+    async def _load_rows(self, api_key: str, is_archived: bool) -> List[Dict]:
+        """Fetch all budget data from upstream and combine it"""
+        # Fetch projects first
+        projects_data = await self._fetch_budget_projects(api_key, is_archived)
+        if not projects_data:
+            logging.debug("No projects data found for budgets.")
+            return []
+
+        # Store project hierarchy info 
+        project_info = {}
+        for project in projects_data:
+            ancestors = project.get('ancestors', [])
+            project_title = self._build_project_title(project, ancestors)
+            project_info[project['id']] = {
+                'title': project_title,
+                'archivedOn': project.get('archivedOn'),
+                'ancestors': ancestors
+            }
 
-    async def _fetch_with_cursor(self, api_key: str, query: dict, key: str) -> List[Dict]:
-        """Fetch all records with cursor pagination"""
+        # Get project IDs and split into chunks
+        project_ids = list(project_info.keys())
+        chunks = [project_ids[i:i + self.chunk_size] 
+                  for i in range(0, len(project_ids), self.chunk_size)]
+
+        # Fetch chunks on a bounded number of workers, earliest chunks first, and fold
+        # each finished job into the combiner so its pages can be released
+        scheduler = WorkScheduler(settings.BUDGET_FETCH_WORKERS)
+        batch_chunks = settings.BUDGET_BATCH_CHUNKS
+        if batch_chunks > 0:
+            for index in range(0, len(chunks), batch_chunks):
+                group = chunks[index:index + batch_chunks]
+                scheduler.add(index, index, lambda group=group: self._fetch_chunk_batch(api_key, group))
+        else:
+            for index, chunk in enumerate(chunks):
+                for order, kind in enumerate(BUDGET_RECORD_QUERIES):
+                    scheduler.add(
+                        (index, order), index,
+                        lambda chunk=chunk, kind=kind: self._fetch_chunk_records(api_key, kind, chunk)
+                    )
+
+        # Chunks hold disjoint projects, so the order they finish in does not change the result
+        combiner = BudgetCombiner()
+        cost_code_ids = {}
+        async for _, records in scheduler.results():
+            combiner.add_hours(records.get("hours", []))
+            combiner.add_costs(records.get("costs", []))
+            progress = records.get("progress", [])
+            combiner.add_progress(progress)
+            cost_code_ids.update((pb['costCodeId'], None) for pb in progress if pb.get('costCodeId'))
+
+        # Get cost codes
+        cost_codes = await self._fetch_cost_codes(api_key, list(cost_code_ids)) if cost_code_ids else []
+
+        # Format and return data without timezone conversion
+        formatted_data = combiner.combine(cost_codes, project_info)
+
+        # Ensure data is JSON-serializable
+        for item in formatted_data:
+            for key, value in item.items():
+                if isinstance(value, datetime):
+                    item[key] = value.isoformat()
+
+        logging.debug(f"Formatted budget data: {formatted_data}")
+        return formatted_data
+
+    async def _fetch_with_cursor(self, api_key: str, query: dict, key: str,
+                                 cursor: Optional[str] = None) -> List[Dict]:
+        """Fetch all records with cursor pagination, optionally resuming after cursor"""
         all_data = []
-        cursor = None
 
-        async with httpx.AsyncClient() as client:
-            while True:
-                current_query = {**query}
-                current_query["variables"]["after"] = cursor
+        while True:
+            current_query = {**query}
+            current_query["variables"]["after"] = cursor
 
-                data = await self._execute_query(client, api_key, current_query, key)
-                if not data:
-                    break
+            data = await self._execute_query(self.client, api_key, current_query, key)
+            if not data:
+                break
 
-                all_data.extend(data)
-                if len(data) < self.batch_size:
-                    break
+            all_data.extend(data)
+            if len(data) < self.batch_size:
+                break
 
-                cursor = data[-1].get("cursor")
-                if not cursor:
-                    break
+            cursor = data[-1].get("cursor")
+            if not cursor:
+                break
 
         return all_data
 
@@ -164,87 +200,123 @@ class BudgetService:
         }
         return await self._fetch_with_cursor(api_key, query, "projects")
 
-    async def _fetch_budget_hours_chunk(self, api_key: str, project_ids: List[str]) -> List[Dict]:
-        query = {
-            "query": """
-                query budgetHoursQuery($filter: BudgetHoursFilter, $sort: [BudgetHoursSort!], $first: Int, $after: String) {
-                    budgetHours(filter: $filter, sort: $sort, first: $first, after: $after) {
-                        id projectId memberId budgetSeconds costCodeId equipmentId createdOn cursor equipmentBudgetSeconds
-                    }
-                }
+    def _chunk_filter(self, kind: str, project_ids: List[str]) -> Dict:
+        return {"projectId": {"contains": project_ids}, **BUDGET_RECORD_QUERIES[kind]["filter"]}
+
+    def _chunk_query(self, kind: str, project_ids: List[str]) -> dict:
+        """Paginated query for one record type of one chunk"""
+        spec = BUDGET_RECORD_QUERIES[kind]
+        return {
+            "query": f"""
+                query {spec['field']}Query($filter: {spec['filter_type']}, $sort: [{spec['sort_type']}!], $first: Int, $after: String) {{
+                    {spec['field']}(filter: $filter, sort: $sort, first: $first, after: $after) {{
+                        {spec['selection']}
+                    }}
+                }}
             """,
             "variables": {
                 "first": self.batch_size,
-                "filter": {
-                    "projectId": {"contains": project_ids},
-                    "isLatest": {"equal": True}
-                },
+                "filter": self._chunk_filter(kind, project_ids),
                 "sort": [{"createdOn": "desc"}]
             }
         }
-        return await self._fetch_with_cursor(api_key, query, "budgetHours")
 
-    async def _fetch_budget_costs_chunk(self, api_key: str, project_ids: List[str]) -> List[Dict]:
-        query = {
-            "query": """
-                query budgetCostQuery($filter: BudgetCostFilter, $sort: [BudgetCostSort!], $first: Int, $after: String) {
-                    budgetCosts(filter: $filter, sort: $sort, first: $first, after: $after) {
-                        id projectId memberId costBudget costCodeId equipmentId cursor equipmentCostBudget
-                    }
-                }
-            """,
-            "variables": {
-                "first": self.batch_size,
-                "filter": {
-                    "projectId": {"contains": project_ids},
-                    "isLatest": {"equal": True}
-                },
-                "sort": [{"createdOn": "desc"}]
-            }
+    def _batched_chunk_query(self, streams: List[Dict]) -> dict:
+        """One document with an aliased field per stream, each with its own filter and cursor"""
+        definitions = ["$first: Int"]
+        fields = []
+        variables = {"first": self.batch_size}
+        for stream in streams:
+            spec = BUDGET_RECORD_QUERIES[stream["kind"]]
+            alias = stream["alias"]
+            definitions.extend([
+                f"${alias}_filter: {spec['filter_type']}",
+                f"${alias}_sort: [{spec['sort_type']}!]",
+                f"${alias}_after: String"
+            ])
+            fields.append(
+                f"{alias}: {spec['field']}(filter: ${alias}_filter, sort: ${alias}_sort, "
+                f"first: $first, after: ${alias}_after) {{ {spec['selection']} }}"
+            )
+            variables.update({
+                f"{alias}_filter": self._chunk_filter(stream["kind"], stream["project_ids"]),
+                f"{alias}_sort": [{"createdOn": "desc"}],
+                f"{alias}_after": stream["cursor"]
+            })
+
+        selections = "\n".join(fields)
+        return {
+            "query": f"query BudgetChunks({', '.join(definitions)}) {{\n{selections}\n}}",
+            "variables": variables
         }
-        return await self._fetch_with_cursor(api_key, query, "budgetCosts")
 
-    async def _fetch_progress_budgets_chunk(self, api_key: str, project_ids: List[str]) -> List[Dict]:
+    async def _fetch_chunk_records(self, api_key: str, kind: str, project_ids: List[str]) -> Dict[str, List[Dict]]:
+        query = self._chunk_query(kind, project_ids)
+        return {kind: await self._fetch_with_cursor(api_key, query, BUDGET_RECORD_QUERIES[kind]["field"])}
+
+    async def _fetch_chunk_batch(self, api_key: str, chunks: List[List[str]]) -> Dict[str, List[Dict]]:
+        """Hours, costs and progress of several chunks through aliased queries.
+
+        Every record type of every chunk is an alias with its own cursor; each
+        round trip asks for the next page of the aliases that still have
+        pages. Once a single alias is left it is finished with regular
+        queries, as are all remaining aliases if upstream rejects the batched
+        document.
+        """
+        streams = [
+            {"alias": f"{kind}_{index}", "kind": kind, "project_ids": chunk, "cursor": None, "records": []}
+            for index, chunk in enumerate(chunks) for kind in BUDGET_RECORD_QUERIES
+        ]
+        active = streams
+        try:
+            while len(active) > 1:
+                data = await self._execute_query(self.client, api_key, self._batched_chunk_query(active), None)
+                remaining = []
+                for stream in active:
+                    page = data.get(stream["alias"]) or []
+                    stream["records"].extend(page)
+                    if len(page) >= self.batch_size and page[-1].get("cursor"):
+                        stream["cursor"] = page[-1]["cursor"]
+                        remaining.append(stream)
+                active = remaining
+        except GraphQLError as e:
+            logging.warning(f"Batched budget query rejected, falling back to unbatched queries: {str(e)}")
+
+        for stream in active:
+            stream["records"].extend(await self._fetch_with_cursor(
+                api_key,
+                self._chunk_query(stream["kind"], stream["project_ids"]),
+                BUDGET_RECORD_QUERIES[stream["kind"]]["field"],
+                stream["cursor"]
+            ))
+
+        records = {kind: [] for kind in BUDGET_RECORD_QUERIES}
+        for stream in streams:
+            records[stream["kind"]].extend(stream["records"])
+        return records
+
+    async def _fetch_cost_codes(self, api_key: str, cost_code_ids: List[str]) -> List[CostCode]:
         query = {
             "query": """
-                query GetProgressBudget($filter: ProgressBudgetFilter, $first: Int, $after: String, $sort: [ProgressBudgetSort!]) {
-                    progressBudgets(first: $first, after: $after, filter: $filter, sort: $sort) {
-                        id cursor quantity value projectId costCodeId
+                query GetCostCodes($filter: CostCodeFilter) {
+                    costCodes(filter: $filter) {
+                        id title costCode
                     }
                 }
             """,
             "variables": {
-                "first": self.batch_size,
-                "filter": {
-                    "projectId": {"contains": project_ids},
-                    "deletedOn": {"isNull": True}
-                },
-                "sort": [{"createdOn": "desc"}]
+                "filter": {"id": {"contains": cost_code_ids}}
             }
         }
-        return await self._fetch_with_cursor(api_key, query, "progressBudgets")
+        return await self._execute_query(self.client, api_key, query, "costCodes")
 
-    async def _fetch_cost_codes(self, api_key: str, cost_code_ids: List[str]) -> List[CostCode]:
-        async with httpx.AsyncClient() as client:
-            query = {
-                "query": """
-                    query GetCostCodes($filter: CostCodeFilter) {
-                        costCodes(filter: $filter) {
-                            id title costCode
-                        }
-                    }
-                """,
-                "variables": {
-                    "filter": {"id": {"contains": cost_code_ids}}
-                }
-            }
-            return await self._execute_query(client, api_key, query, "costCodes")
-
-    async def _execute_query(self, client: httpx.AsyncClient, api_key: str, query: dict, result_key: str):
-        """Execute GraphQL query asynchronously"""
+    async def _execute_query(self, client: httpx.AsyncClient, api_key: str, query: dict, result_key: Optional[str]):
+        """Execute GraphQL query asynchronously; without result_key the whole data object is returned"""
         try:
-            response = await client.post(
+            response = await post_with_retry(
+                client,
                 self.url,
+                self.retry_budget,
                 json=query,
                 headers={
                     "key-authorization": api_key,
@@ -254,11 +326,14 @@ class BudgetService:
             )
 
             response.raise_for_status()
-            data = response.json()
+            data = loads(response.content)
 
             if "errors" in data and data["errors"]:
                 error_messages = [error.get('message', 'Unknown error') for error in data["errors"]]
-                raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
+                raise GraphQLError(f"GraphQL errors: {', '.join(error_messages)}")
+
+            if result_key is None:
+                return data.get("data") or {}
 
             result = data.get("data", {}).get(result_key)
             if result is None:
@@ -273,77 +348,3 @@ class BudgetService:
         except Exception as e:
             logging.error(f"Error executing query: {str(e)}")
             raise
-
-    def _combine_hierarchical_data(self, hours: List[Dict], costs: List[Dict],
-                                   progress: List[Dict], cost_codes: List[Dict],
-                                   project_info: Dict[str, Dict]) -> List[Dict]:
-        """Combine all budget data with hierarchy support"""
-        combined_data = []
-        cost_code_map = {cc['id']: cc for cc in cost_codes}
-
-        # Group data by project first
-        for proj_id, proj_data in project_info.items():
-            # Create base project entry first (without cost codes)
-            project_hours = sum(h.get('budgetSeconds', 0) / 3600 for h in hours
-                                if h.get('projectId') == proj_id and not h.get('costCodeId'))
-            project_costs = sum(float(c.get('costBudget', 0) or 0) for c in costs
-                                if c.get('projectId') == proj_id and not c.get('costCodeId'))
-
-            combined_data.append({
-                'id': '',
-                'project_id': proj_id,
-                'project_title': proj_data['title'],
-                'cost_code_id': None,
-                'cost_code_title': '',
-                'labor_hours': project_hours,
-                'labor_cost': project_costs,
-                'progress_value': 0,
-                'quantity': 0,
-                'status': 'Archived' if proj_data.get('archivedOn') else 'Active'
-            })
-
-            # Find all cost codes with actual data
-            project_cost_codes = set()
-
-            # Only add cost codes that have progress values or quantities
-            for prog in progress:
-                if (prog.get('projectId') == proj_id
-                    and prog.get('costCodeId')
-                        and (prog.get('value') or prog.get('quantity'))):
-                    project_cost_codes.add(prog.get('costCodeId'))
-
-            # Create entries for each valid cost code
-            for cc_id in project_cost_codes:
-                if cc_id in cost_code_map:
-                    cost_code = cost_code_map[cc_id]
-                    cc_progress = next((p for p in progress
-                                        if p.get('projectId') == proj_id
-                                        and p.get('costCodeId') == cc_id), {})
-
-                    if cc_progress:  # Only create entry if there's progress data
-                        cc_hours = next((h for h in hours
-                                         if h.get('projectId') == proj_id
-                                         and h.get('costCodeId') == cc_id), {})
-                        cc_costs = next((c for c in costs
-                                         if c.get('projectId') == proj_id
-                                         and c.get('costCodeId') == cc_id), {})
-
-                        combined_data.append({
-                            'id': cc_progress.get('id', ''),
-                            'project_id': proj_id,
-                            'project_title': proj_data['title'],
-                            'cost_code_id': cc_id,
-                            'cost_code_title': f"{cost_code.get('costCode', '')} {cost_code.get('title', '')}".strip(),
-                            'labor_hours': cc_hours.get('budgetSeconds', 0) / 3600 if cc_hours.get('budgetSeconds') is not None else 0,
-                            'labor_cost': float(cc_costs.get('costBudget', 0) or 0),
-                            'progress_value': float(cc_progress.get('value', 0) or 0),
-                            'quantity': float(cc_progress.get('quantity', 0) or 0),
-                            'status': 'Archived' if proj_data.get('archivedOn') else 'Active'
-                        })
-
-        # Sort by project title and cost code
-        def sort_key(item):
-            parts = item['project_title'].split(' / ')
-            return tuple([p.lower() for p in parts] + [item.get('cost_code_title', '').lower()])
-
-        return sorted(combined_data, key=sort_key)
@@ -0,0 +1,159 @@
+import asyncio
+import itertools
+import logging
+import random
+import time
+from typing import List, Optional
+from ..config import settings
+from ..utils.http_client import get_http_client
+from ..utils.tenant_cache import tenant_fingerprint
+from .project_service import ProjectService
+from .budget_service import BudgetService
+from .employee_service import EmployeeService
+from .cost_code_service import CostCodeService
+from .equipment_service import EquipmentService
+
+# Services whose cached data can be warmed, by their CACHE_WARM_DATASETS name
+WARMABLE_SERVICES = {
+    "projects": ProjectService,
+    "budgets": BudgetService,
+    "employees": EmployeeService,
+    "cost_codes": CostCodeService,
+    "equipment": EquipmentService,
+}
+
+_warmer: Optional["CacheWarmer"] = None
+
+
+class WarmJob:
+    """One cached dataset of one tenant, active or archived (deleted for equipment)"""
+
+    def __init__(self, api_key: str, dataset: str, archived: bool):
+        self.api_key = api_key
+        self.dataset = dataset
+        self.archived = archived
+        self.next_run = 0.0
+
+    @property
+    def priority(self) -> int:
+        # Most requests read active data, so it is refreshed first
+        return 1 if self.archived else 0
+
+    def __str__(self) -> str:
+        state = "archived" if self.archived else "active"
+        return f"{self.dataset} ({state}) of tenant {tenant_fingerprint(self.api_key)[:8]}"
+
+
+class CacheWarmer:
+    """Keep the cached datasets of configured tenants warm.
+
+    A scheduler puts jobs on a priority queue as they come due, active data
+    ahead of archived, and CACHE_WARM_CONCURRENCY workers run them. A job
+    refreshes its entry when it goes stale within the lead time, under the
+    same lock user-triggered refreshes take, so one worker in the deployment
+    does the work. It is then rescheduled for shortly before the new entry's
+    soft TTL, which follows the tenant's TTL overrides; random jitter keeps
+    tenants from refreshing in lockstep.
+    """
+
+    def __init__(self, api_keys: List[str], datasets: List[str], include_archived: bool):
+        states = (False, True) if include_archived else (False,)
+        self.jobs = [
+            WarmJob(api_key, dataset, archived)
+            for api_key in api_keys for dataset in datasets for archived in states
+        ]
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._rescheduled = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        now = time.time()
+        for job in self.jobs:
+            # Spread the first round out instead of hitting upstream for every tenant at once
+            job.next_run = now + random.uniform(0, settings.CACHE_WARM_JITTER_SECONDS)
+
+        self._tasks = [asyncio.create_task(self._schedule())]
+        self._tasks.extend(
+            asyncio.create_task(self._work()) for _ in range(max(settings.CACHE_WARM_CONCURRENCY, 1))
+        )
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _schedule(self) -> None:
+        """Queue jobs as they come due"""
+        while True:
+            now = time.time()
+            for job in self.jobs:
+                if job.next_run <= now:
+                    self.queue.put_nowait((job.priority, job.next_run, next(self._order), job))
+                    job.next_run = float("inf")  # Rescheduled once the job has run
+
+            self._rescheduled.clear()
+            upcoming = min(job.next_run for job in self.jobs)
+            try:
+                await asyncio.wait_for(self._rescheduled.wait(), timeout=min(upcoming - now, 3600))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self) -> None:
+        while True:
+            _, _, _, job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: WarmJob) -> None:
+        """Refresh one entry if it is about to go stale and schedule the next check"""
+        max_lead = settings.CACHE_WARM_LEAD_SECONDS + settings.CACHE_WARM_JITTER_SECONDS
+        service = WARMABLE_SERVICES[job.dataset](get_http_client())
+        try:
+            seconds_until_stale = await service.warm_cache(job.api_key, job.archived, max_lead)
+        except Exception as e:
+            logging.error(f"Cache warming of {job} failed: {str(e)}")
+            seconds_until_stale = None
+
+        if seconds_until_stale is None:
+            delay = settings.CACHE_WARM_MIN_INTERVAL_SECONDS
+        else:
+            lead = settings.CACHE_WARM_LEAD_SECONDS + random.uniform(0, settings.CACHE_WARM_JITTER_SECONDS)
+            delay = max(seconds_until_stale - lead, settings.CACHE_WARM_MIN_INTERVAL_SECONDS)
+
+        logging.info(f"Cache warming of {job} done, next check in {delay:.0f}s")
+        job.next_run = time.time() + delay
+        self._rescheduled.set()
+
+
+def _configured_datasets() -> List[str]:
+    datasets = []
+    for name in (name.strip() for name in settings.CACHE_WARM_DATASETS.split(",")):
+        if name in WARMABLE_SERVICES:
+            datasets.append(name)
+        elif name:
+            logging.warning(f"Unknown dataset '{name}' in CACHE_WARM_DATASETS, skipping it")
+    return datasets
+
+
+async def start_cache_warmer() -> None:
+    """Start warming the caches of the tenants in CACHE_WARM_API_KEYS, if any"""
+    global _warmer
+    api_keys = [key.strip() for key in settings.CACHE_WARM_API_KEYS.split(",") if key.strip()]
+    datasets = _configured_datasets()
+    if _warmer is not None or not api_keys or not datasets:
+        return
+
+    _warmer = CacheWarmer(api_keys, datasets, settings.CACHE_WARM_ARCHIVED)
+    _warmer.start()
+    logging.info(f"Warming {', '.join(datasets)} caches of {len(api_keys)} tenants")
+
+
+async def stop_cache_warmer() -> None:
+    global _warmer
+    if _warmer is not None:
+        await _warmer.stop()
+        _warmer = None
@@ -1,94 +1,126 @@
 import httpx
 import asyncio
 import logging
-from typing import List, Optional, Dict
+from typing import AsyncIterator, List, Optional, Dict
 from datetime import datetime
 from ..config import settings
 from ..models.cost_code import CostCode
-from ..utils.timezone_utils import convert_utc_to_timezone
+from ..utils.timezone_utils import format_timestamp
+from ..utils.redis_cache import RedisCache
+from ..utils.cached_dataset import CachedDataset
+from ..utils.http_client import get_http_client
+from ..utils.retry import RetryBudget, post_with_retry
+from ..utils.pipeline import pipelined
+from ..utils.serialization import loads
 
-class CostCodeService:
-    def __init__(self):
+class CostCodeService(CachedDataset):
+    cache_name = "cost_code_data"
+    dataset_label = "cost codes"
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.url = settings.BUSYBUSY_GRAPHQL_URL
+        self.client = client or get_http_client()
+        self.retry_budget = RetryBudget()
         self.batch_size = 1000
+        self.cache = RedisCache()
 
     async def fetch_cost_codes(self, api_key: str, is_archived: bool, timezone: str) -> List[Dict]:
-        try:
-            all_cost_codes = []
-            after_cursor = None
-
-            while True:
-                query = {
-                    "query": """
-                        query QueryCostCodes($filter: CostCodeFilter!, $first: Int, $after: String, $sort: [CostCodeSort!]) {
-                            costCodes(filter: $filter, first: $first, after: $after, sort: $sort) {
-                                id
-                                cursor
-                                costCode
-                                title
-                                unitTitle
-                                costCodeGroup {
-                                    groupName
-                                }
-                                createdOn
-                                updatedOn
-                                archivedOn
-                            }
-                        }
-                    """,
-                    "variables": {
-                        "filter": {
-                            "archivedOn": {"isNull": not is_archived}
-                        },
-                        "sort": [
-                            {"costCode": "asc"},
-                            {"title": "asc"}
-                        ],
-                        "first": self.batch_size,
-                        "after": after_cursor
-                    }
-                }
+        """Fetch cost code rows with Redis caching, converting timestamps after the cache"""
+        rows, _ = await self.fetch_with_version(api_key, is_archived, timezone)
+        return rows
+
+    def _iter_rows(self, api_key: str, is_archived: bool) -> AsyncIterator[List[Dict]]:
+        return pipelined(self.iter_cost_code_pages(api_key, is_archived), self.prepare_cost_code_data)
+
+    async def _load_rows(self, api_key: str, is_archived: bool) -> List[Dict]:
+        """Fetch and format all cost code rows (timestamps stay in UTC)"""
+        return await asyncio.to_thread(self.prepare_cost_code_data, await self._load_cost_codes(api_key, is_archived))
+
+    async def _load_cost_codes(self, api_key: str, is_archived: bool) -> List[Dict]:
+        """Raw cost codes from a full crawl
 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        self.url,
-                        json=query,
-                        headers={"key-authorization": api_key},
-                        timeout=60.0
-                    )
+        A renamed cost code group doesn't move the cost code's updatedOn, so
+        cost codes can't be delta synced.
+        """
+        all_cost_codes = []
+        async for cost_codes in self.iter_cost_code_pages(api_key, is_archived):
+            all_cost_codes.extend(cost_codes)
+        return all_cost_codes
 
-                    if response.status_code != 200:
-                        raise Exception(f"HTTP {response.status_code}: {response.text}")
+    async def iter_cost_code_pages(self, api_key: str, is_archived: bool) -> AsyncIterator[List[Dict]]:
+        """Yield raw cost code pages as they arrive from the API"""
+        after_cursor = None
 
-                    data = response.json()
-                    
-                    # Check for GraphQL errors
-                    if data.get("errors"):
-                        error_messages = [error.get('message', 'Unknown error') 
-                                       for error in data["errors"]]
-                        if error_messages:
-                            raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
+        while True:
+            query = self._build_query(is_archived, after_cursor)
 
-                    cost_codes = data.get("data", {}).get("costCodes", [])
-                    if not cost_codes:
-                        break
+            response = await post_with_retry(
+                self.client,
+                self.url,
+                self.retry_budget,
+                json=query,
+                headers={"key-authorization": api_key},
+                timeout=60.0
+            )
 
-                    all_cost_codes.extend(cost_codes)
+            if response.status_code != 200:
+                raise Exception(f"HTTP {response.status_code}: {response.text}")
 
-                    if len(cost_codes) < self.batch_size:
-                        break
+            data = loads(response.content)
 
-                    after_cursor = cost_codes[-1].get("cursor")
-                    if not after_cursor:
-                        break
+            # Check for GraphQL errors
+            if data.get("errors"):
+                error_messages = [error.get('message', 'Unknown error') 
+                                  for error in data["errors"]]
+                if error_messages:
+                    raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
 
-            return self.prepare_cost_code_data(all_cost_codes, timezone)
+            cost_codes = data.get("data", {}).get("costCodes", [])
+            if not cost_codes:
+                break
 
-        except Exception as e:
-            logging.error(f"Error fetching cost codes: {str(e)}", exc_info=True)
-            raise
+            yield cost_codes
+
+            if len(cost_codes) < self.batch_size:
+                break
+
+            after_cursor = cost_codes[-1].get("cursor")
+            if not after_cursor:
+                break
+
+    def _build_query(self, is_archived: bool, after_cursor: Optional[str]) -> dict:
+        return {
+            "query": """
+                query QueryCostCodes($filter: CostCodeFilter!, $first: Int, $after: String, $sort: [CostCodeSort!]) {
+                    costCodes(filter: $filter, first: $first, after: $after, sort: $sort) {
+                        id
+                        cursor
+                        costCode
+                        title
+                        unitTitle
+                        costCodeGroup {
+                            groupName
+                        }
+                        createdOn
+                        updatedOn
+                        archivedOn
+                    }
+                }
+            """,
+            "variables": {
+                "filter": {
+                    "archivedOn": {"isNull": not is_archived}
+                },
+                "sort": [
+                    {"costCode": "asc"},
+                    {"title": "asc"}
+                ],
+                "first": self.batch_size,
+                "after": after_cursor
+            }
+        }
 
-    def prepare_cost_code_data(self, cost_codes: List[Dict], timezone: str) -> List[Dict]:
+    def prepare_cost_code_data(self, cost_codes: List[Dict], timezone: Optional[str] = None) -> List[Dict]:
         formatted_data = []
         
         for cc in cost_codes:
@@ -108,8 +140,8 @@ class CostCodeService:
                     'title': cc.get('title', ''),
                     'unit_title': cc.get('unitTitle', ''),
                     'group_name': cost_code_group.get('groupName', ''),
-                    'created_on': convert_utc_to_timezone(cc.get('createdOn', ''), timezone),
-                    'updated_on': convert_utc_to_timezone(cc.get('updatedOn', ''), timezone),
+                    'created_on': format_timestamp(cc.get('createdOn', ''), timezone),
+                    'updated_on': format_timestamp(cc.get('updatedOn', ''), timezone),
                     'status': 'Archived' if cc.get('archivedOn') else 'Active'
                 })
             except Exception as e:
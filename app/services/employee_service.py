@@ -1,104 +1,136 @@
 import httpx
 import asyncio
 import logging
-from typing import List, Optional, Dict
+from typing import AsyncIterator, List, Optional, Dict
 from datetime import datetime
 from ..config import settings
 from ..models.employee import Employee
-from ..utils.timezone_utils import convert_utc_to_timezone
+from ..utils.timezone_utils import format_timestamp
+from ..utils.redis_cache import RedisCache
+from ..utils.cached_dataset import CachedDataset
+from ..utils.http_client import get_http_client
+from ..utils.retry import RetryBudget, post_with_retry
+from ..utils.pipeline import pipelined
+from ..utils.serialization import loads
 
 
-class EmployeeService:
-    def __init__(self):
+class EmployeeService(CachedDataset):
+    cache_name = "employee_data"
+    dataset_label = "employees"
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.url = settings.BUSYBUSY_GRAPHQL_URL
+        self.client = client or get_http_client()
+        self.retry_budget = RetryBudget()
         self.batch_size = 1000
+        self.cache = RedisCache()
 
     async def fetch_employees(self, api_key: str, is_archived: bool, timezone: str) -> List[Dict]:
-        try:
-            all_employees = []
-            after_cursor = None
-
-            while True:
-                query = {
-                    "query": """
-                        query QueryEmployeesList($filter: MemberFilter!, $first: Int, $after: String, $sort: [MemberSort!]) {
-                            members(filter: $filter, first: $first, after: $after, sort: $sort) {
-                                id firstName lastName username email phone memberNumber
-                                position { title }
-                                memberGroup { groupName }
-                                wageHistories {
-                                    wage wageRate overburden effectiveRate
-                                    createdOn updatedOn deletedOn changeDate
-                                }
-                                isSubContractor timeLocationRequired
-                                createdOn updatedOn archivedOn cursor
-                            }
+        """Fetch employee rows with Redis caching, converting timestamps after the cache"""
+        rows, _ = await self.fetch_with_version(api_key, is_archived, timezone)
+        return rows
+
+    def _iter_rows(self, api_key: str, is_archived: bool) -> AsyncIterator[List[Dict]]:
+        return pipelined(self.iter_employee_pages(api_key, is_archived), self.prepare_employee_data)
+
+    async def _load_rows(self, api_key: str, is_archived: bool) -> List[Dict]:
+        """Fetch and format all employee rows (timestamps stay in UTC)"""
+        return await asyncio.to_thread(self.prepare_employee_data, await self._load_members(api_key, is_archived))
+
+    async def _load_members(self, api_key: str, is_archived: bool) -> List[Dict]:
+        """Raw members from a full crawl
+
+        Wage histories, positions and groups are nested records whose edits
+        don't move the member's updatedOn, so members can't be delta synced.
+        """
+        all_members = []
+        async for members in self.iter_employee_pages(api_key, is_archived):
+            all_members.extend(members)
+        return all_members
+
+    async def iter_employee_pages(self, api_key: str, is_archived: bool) -> AsyncIterator[List[Dict]]:
+        """Yield raw member pages as they arrive from the API"""
+        after_cursor = None
+
+        while True:
+            query = self._build_query(is_archived, after_cursor)
+
+            response = await post_with_retry(
+                self.client,
+                self.url,
+                self.retry_budget,
+                json=query,
+                headers={"key-authorization": api_key},
+                timeout=60.0
+            )
+
+            if response.status_code != 200:
+                raise Exception(f"HTTP {response.status_code}: {response.text}")
+
+            data = loads(response.content)
+
+            # Check for GraphQL errors
+            if data.get("errors"):
+                error_messages = [error.get('message', 'Unknown error') 
+                                  for error in data["errors"]]
+                if error_messages:
+                    raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
+
+            # Verify data structure
+            if "data" not in data:
+                raise Exception("Invalid GraphQL response: missing data field")
+
+            members = data.get("data", {}).get("members")
+            if members is None:
+                raise Exception("Invalid GraphQL response: missing members field")
+
+            if not members:  # Empty list is ok, just break the loop
+                break
+
+            yield members
+
+            if len(members) < self.batch_size:
+                break
+
+            after_cursor = members[-1].get("cursor")
+            if not after_cursor:
+                break
+
+    def _build_query(self, is_archived: bool, after_cursor: Optional[str]) -> dict:
+        return {
+            "query": """
+                query QueryEmployeesList($filter: MemberFilter!, $first: Int, $after: String, $sort: [MemberSort!]) {
+                    members(filter: $filter, first: $first, after: $after, sort: $sort) {
+                        id firstName lastName username email phone memberNumber
+                        position { title }
+                        memberGroup { groupName }
+                        wageHistories {
+                            wage wageRate overburden effectiveRate
+                            createdOn updatedOn deletedOn changeDate
                         }
-                    """,
-                    "variables": {
-                        "filter": {
-                            "archivedOn": {"isNull": not is_archived},
-                            "permissions": {
-                                "permissions": ["manageEmployees"],
-                                "operationType": "and"
-                            }
-                        },
-                        "sort": [
-                            {"firstName": "asc"},
-                            {"lastName": "asc"}
-                        ],
-                        "first": self.batch_size,
-                        "after": after_cursor
+                        isSubContractor timeLocationRequired
+                        createdOn updatedOn archivedOn cursor
                     }
                 }
-
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        self.url,
-                        json=query,
-                        headers={"key-authorization": api_key},
-                        timeout=60.0
-                    )
-
-                    if response.status_code != 200:
-                        raise Exception(f"HTTP {response.status_code}: {response.text}")
-
-                    data = response.json()
-                    
-                    # Check for GraphQL errors
-                    if data.get("errors"):
-                        error_messages = [error.get('message', 'Unknown error') 
-                                       for error in data["errors"]]
-                        if error_messages:
-                            raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
-                    
-                    # Verify data structure
-                    if "data" not in data:
-                        raise Exception("Invalid GraphQL response: missing data field")
-                        
-                    members = data.get("data", {}).get("members")
-                    if members is None:
-                        raise Exception("Invalid GraphQL response: missing members field")
-
-                    if not members:  # Empty list is ok, just break the loop
-                        break
-
-                    all_employees.extend(members)
-
-                    if len(members) < self.batch_size:
-                        break
-
-                    after_cursor = members[-1].get("cursor")
-                    if not after_cursor:
-                        break
-
-            return self.prepare_employee_data(all_employees, timezone)
-
-        except Exception as e:
-            logging.error(f"Error fetching employees: {str(e)}", exc_info=True)
-            raise
-
-    def prepare_employee_data(self, employees: List[Dict], timezone: str) -> List[Dict]:
+            """,
+            "variables": {
+                "filter": {
+                    "archivedOn": {"isNull": not is_archived},
+                    "permissions": {
+                        "permissions": ["manageEmployees"],
+                        "operationType": "and"
+                    }
+                },
+                "sort": [
+                    {"firstName": "asc"},
+                    {"lastName": "asc"}
+                ],
+                "first": self.batch_size,
+                "after": after_cursor
+            }
+        }
+
+    def prepare_employee_data(self, employees: List[Dict], timezone: Optional[str] = None) -> List[Dict]:
         payroll_types = {10: 'Hourly', 30: 'Weekly', 40: 'Monthly', 50: 'Yearly'}
         gps_settings = {"YES": 'required', "AUTO": 'not required', "NO": 'off'}
         formatted_data = []
@@ -140,8 +172,8 @@ class EmployeeService:
                     'position': position.get('title', ''),
                     'is_subcontractor': 'Yes' if emp.get('isSubContractor') else 'No',
                     'gps_setting': gps_settings.get(emp.get('timeLocationRequired'), ''),
-                    'created_on': convert_utc_to_timezone(emp.get('createdOn', ''), timezone),
-                    'updated_on': convert_utc_to_timezone(emp.get('updatedOn', ''), timezone),
+                    'created_on': format_timestamp(emp.get('createdOn', ''), timezone),
+                    'updated_on': format_timestamp(emp.get('updatedOn', ''), timezone),
                     'status': 'Archived' if emp.get('archivedOn') else 'Active'
                 })
 
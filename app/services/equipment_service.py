@@ -1,118 +1,152 @@
 import httpx
 import asyncio
 import logging
-from typing import List, Optional, Dict
+from typing import AsyncIterator, List, Optional, Dict
 from datetime import datetime
 from ..config import settings
 from ..models.equipment import Equipment
-from ..utils.timezone_utils import convert_utc_to_timezone
+from ..utils.timezone_utils import format_timestamp
+from ..utils.redis_cache import RedisCache
+from ..utils.cached_dataset import CachedDataset
+from ..utils.http_client import get_http_client
+from ..utils.retry import RetryBudget, post_with_retry
+from ..utils.pipeline import pipelined
+from ..utils.serialization import loads
 
-class EquipmentService:
-    def __init__(self):
+class EquipmentService(CachedDataset):
+    cache_name = "equipment_data"
+    dataset_label = "equipment"
+    inactive_name = "deleted"
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.url = settings.BUSYBUSY_GRAPHQL_URL
+        self.client = client or get_http_client()
+        self.retry_budget = RetryBudget()
         self.batch_size = 1000
+        self.cache = RedisCache()
 
     async def fetch_equipment(self, api_key: str, is_deleted: bool, timezone: str) -> List[Dict]:
-        try:
-            all_equipment = []
-            after_cursor = None
-
-            while True:
-                query = {
-                    "query": """
-                        query GetEquipment($filter: EquipmentFilter, $first: Int, $after: String, $sort: [EquipmentSort!]) {
-                            equipment(filter: $filter, first: $first, after: $after, sort: $sort) {
+        """Fetch equipment rows with Redis caching, converting timestamps after the cache"""
+        rows, _ = await self.fetch_with_version(api_key, is_deleted, timezone)
+        return rows
+
+    def _iter_rows(self, api_key: str, is_deleted: bool) -> AsyncIterator[List[Dict]]:
+        return pipelined(self.iter_equipment_pages(api_key, is_deleted), self.prepare_equipment_data)
+
+    async def _load_rows(self, api_key: str, is_deleted: bool) -> List[Dict]:
+        """Fetch and format all equipment rows (timestamps stay in UTC)"""
+        return await asyncio.to_thread(self.prepare_equipment_data, await self._load_equipment(api_key, is_deleted))
+
+    async def _load_equipment(self, api_key: str, is_deleted: bool) -> List[Dict]:
+        """Raw equipment from a full crawl
+
+        New lastHours readings and costHistory rates are nested records that
+        don't move the equipment's updatedOn, so equipment can't be delta synced.
+        """
+        all_equipment = []
+        async for equipment_data in self.iter_equipment_pages(api_key, is_deleted):
+            all_equipment.extend(equipment_data)
+        return all_equipment
+
+    async def iter_equipment_pages(self, api_key: str, is_deleted: bool) -> AsyncIterator[List[Dict]]:
+        """Yield raw equipment pages as they arrive from the API"""
+        after_cursor = None
+
+        while True:
+            query = self._build_query(is_deleted, after_cursor)
+
+            try:
+                response = await post_with_retry(
+                    self.client,
+                    self.url,
+                    self.retry_budget,
+                    json=query,
+                    headers={"key-authorization": api_key},
+                    timeout=60.0
+                )
+                response.raise_for_status()
+                data = loads(response.content)
+
+                if "errors" in data:
+                    error_messages = [e.get('message', 'Unknown error') for e in data["errors"]]
+                    if error_messages:
+                        raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
+
+                equipment_data = data.get("data", {}).get("equipment", [])
+
+            except httpx.HTTPError as http_err:
+                logging.error(f"HTTP error occurred: {http_err}")
+                raise Exception(f"HTTP error: {http_err}")
+            except Exception as e:
+                logging.error(f"Error during request: {str(e)}")
+                raise
+
+            if not equipment_data:
+                break
+
+            yield equipment_data
+
+            if len(equipment_data) < self.batch_size:
+                break
+
+            after_cursor = equipment_data[-1].get("cursor")
+            if not after_cursor:
+                break
+
+    def _build_query(self, is_deleted: bool, after_cursor: Optional[str]) -> dict:
+        return {
+            "query": """
+                query GetEquipment($filter: EquipmentFilter, $first: Int, $after: String, $sort: [EquipmentSort!]) {
+                    equipment(filter: $filter, first: $first, after: $after, sort: $sort) {
+                        id
+                        equipmentName
+                        year
+                        model {
+                            id
+                            type
+                            title
+                            unknown
+                            make {
+                                id
+                                title
+                                unknown
+                            }
+                            category {
                                 id
-                                equipmentName
-                                year
-                                model {
-                                    id
-                                    type
-                                    title
-                                    unknown
-                                    make {
-                                        id
-                                        title
-                                        unknown
-                                    }
-                                    category {
-                                        id
-                                        title
-                                    }
-                                }
-                                lastHours {
-                                    id
-                                    runningHours
-                                }
-                                costHistory {
-                                    id
-                                    operatorCostRate
-                                    createdOn
-                                    deletedOn
-                                }
-                                cursor
-                                createdOn
-                                updatedOn
-                                deletedOn
+                                title
                             }
                         }
-                    """,
-                    "variables": {
-                        "filter": {
-                            "deletedOn": {"isNull": not is_deleted}
-                        },
-                        "sort": [
-                            {"equipmentName": "asc"},
-                            {"createdOn": "desc"}
-                        ],
-                        "first": self.batch_size,
-                        "after": after_cursor
+                        lastHours {
+                            id
+                            runningHours
+                        }
+                        costHistory {
+                            id
+                            operatorCostRate
+                            createdOn
+                            deletedOn
+                        }
+                        cursor
+                        createdOn
+                        updatedOn
+                        deletedOn
                     }
                 }
+            """,
+            "variables": {
+                "filter": {
+                    "deletedOn": {"isNull": not is_deleted}
+                },
+                "sort": [
+                    {"equipmentName": "asc"},
+                    {"createdOn": "desc"}
+                ],
+                "first": self.batch_size,
+                "after": after_cursor
+            }
+        }
 
-                async with httpx.AsyncClient() as client:
-                    try:
-                        response = await client.post(
-                            self.url,
-                            json=query,
-                            headers={"key-authorization": api_key},
-                            timeout=60.0
-                        )
-                        response.raise_for_status()
-                        data = response.json()
-
-                        if "errors" in data:
-                            error_messages = [e.get('message', 'Unknown error') for e in data["errors"]]
-                            if error_messages:
-                                raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
-                            
-                        equipment_data = data.get("data", {}).get("equipment", [])
-                        if not equipment_data:
-                            break
-
-                        all_equipment.extend(equipment_data)
-
-                        if len(equipment_data) < self.batch_size:
-                            break
-
-                        after_cursor = equipment_data[-1].get("cursor")
-                        if not after_cursor:
-                            break
-
-                    except httpx.HTTPError as http_err:
-                        logging.error(f"HTTP error occurred: {http_err}")
-                        raise Exception(f"HTTP error: {http_err}")
-                    except Exception as e:
-                        logging.error(f"Error during request: {str(e)}")
-                        raise
-
-            return self.prepare_equipment_data(all_equipment, timezone)
-
-        except Exception as e:
-            logging.error(f"Error fetching equipment: {str(e)}", exc_info=True)
-            raise
-
-    def prepare_equipment_data(self, equipment_list: List[Dict], timezone: str) -> List[Dict]:
+    def prepare_equipment_data(self, equipment_list: List[Dict], timezone: Optional[str] = None) -> List[Dict]:
         formatted_data = []
         
         for equip in equipment_list:
@@ -146,8 +180,8 @@ class EquipmentService:
                     'year': equip.get('year', ''),
                     'running_hours': last_hours.get('runningHours', ''),
                     'operator_cost_rate': latest_cost.get('operatorCostRate', ''),
-                    'created_on': convert_utc_to_timezone(equip.get('createdOn', ''), timezone),
-                    'updated_on': convert_utc_to_timezone(equip.get('updatedOn', ''), timezone),
+                    'created_on': format_timestamp(equip.get('createdOn', ''), timezone),
+                    'updated_on': format_timestamp(equip.get('updatedOn', ''), timezone),
                     'status': 'Deleted' if equip.get('deletedOn') else 'Active'
                 })
             except Exception as e:
@@ -0,0 +1,188 @@
+import asyncio
+import gzip
+import logging
+import time
+import uuid
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+import httpx
+from ..config import settings
+from ..utils.http_client import get_http_client
+from ..utils.redis_cache import RedisCache
+from ..utils.response_formats import TABLE_FORMAT, iter_batches, to_table
+from ..utils.serialization import dumps
+from ..utils.tenant_cache import tenant_cache_key
+from .project_service import ProjectService
+from .budget_service import BudgetService
+from .employee_service import EmployeeService
+from .cost_code_service import CostCodeService
+from .equipment_service import EquipmentService
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+async def _budget_batches(client: httpx.AsyncClient, api_key: str, is_archived: bool,
+                          timezone: Optional[str]) -> AsyncIterator[List[Dict]]:
+    # Budget rows are sorted across all projects, so they only exist once complete
+    budgets = await BudgetService(client).fetch_all_budgets(api_key, is_archived)
+    async for batch in iter_batches(budgets or []):
+        yield batch
+
+
+# Row batches of each exportable dataset, from (client, api_key, archived/deleted flag, timezone)
+EXPORT_DATASETS: Dict[str, Callable[..., AsyncIterator[List[Dict]]]] = {
+    "projects": lambda client, api_key, flag, timezone:
+        ProjectService(client).stream_rows(api_key, flag, timezone),
+    "budgets": _budget_batches,
+    "employees": lambda client, api_key, flag, timezone:
+        EmployeeService(client).stream_rows(api_key, flag, timezone),
+    "cost-codes": lambda client, api_key, flag, timezone:
+        CostCodeService(client).stream_rows(api_key, flag, timezone),
+    "equipment": lambda client, api_key, flag, timezone:
+        EquipmentService(client).stream_rows(api_key, flag, timezone),
+}
+
+# Jobs running in this worker, kept referenced so they are not garbage collected
+_job_tasks: Set[asyncio.Task] = set()
+_job_slots: Optional[asyncio.Semaphore] = None
+
+
+def _slots() -> asyncio.Semaphore:
+    global _job_slots
+    if _job_slots is None:
+        _job_slots = asyncio.Semaphore(max(settings.JOB_CONCURRENCY, 1))
+    return _job_slots
+
+
+class JobNotFound(Exception):
+    pass
+
+
+class JobNotFinished(Exception):
+    pass
+
+
+class ExportJobService:
+    """Run dataset exports in the background, tracked in Redis.
+
+    The job record (status, rows collected so far, timestamps) and the
+    finished result live in the tenant's cache namespace, so any worker can
+    answer for a job another worker ran, and only the API key that created a
+    job can read it. Running jobs rewrite their record every
+    JOB_HEARTBEAT_SECONDS; a record that stops being refreshed belongs to a
+    worker that went away and is reported as failed.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self.client = client or get_http_client()
+        self.cache = RedisCache()
+
+    def _job_key(self, api_key: str, job_id: str) -> str:
+        return tenant_cache_key(api_key, f"job:{job_id}")
+
+    def _result_key(self, api_key: str, job_id: str) -> str:
+        return tenant_cache_key(api_key, f"job:{job_id}:result")
+
+    async def create(self, api_key: str, dataset: str, flag: bool, timezone: Optional[str], format: str) -> Dict:
+        """Store a new job and start it in this worker"""
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "dataset": dataset,
+            "format": format,
+            "status": JOB_QUEUED,
+            "rows": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None
+        }
+        if not await self._save(api_key, job):
+            raise Exception("Job could not be stored, Redis is unavailable")
+
+        task = asyncio.create_task(self._run(api_key, job, flag, timezone))
+        _job_tasks.add(task)
+        task.add_done_callback(_job_tasks.discard)
+        return dict(job)
+
+    async def get(self, api_key: str, job_id: str) -> Dict:
+        job = await self.cache.get_cached_data(self._job_key(api_key, job_id))
+        if not job:
+            raise JobNotFound(f"Job {job_id} not found or expired")
+
+        if job["status"] not in FINISHED_STATUSES and \
+                time.time() - job["updated_at"] > settings.JOB_HEARTBEAT_SECONDS * 3:
+            return {**job, "status": JOB_FAILED, "error": "Job was interrupted, the worker running it stopped"}
+        return job
+
+    async def result(self, api_key: str, job_id: str) -> bytes:
+        """Gzip-compressed JSON result of a finished job"""
+        job = await self.get(api_key, job_id)
+        if job["status"] != JOB_SUCCEEDED:
+            raise JobNotFinished(f"Job {job_id} is {job['status']}")
+
+        body = await self.cache.get_bytes(self._result_key(api_key, job_id))
+        if body is None:
+            raise JobNotFound(f"Result of job {job_id} has expired")
+        return body
+
+    async def _save(self, api_key: str, job: Dict) -> bool:
+        job["updated_at"] = time.time()
+        return await self.cache.set_cached_data(self._job_key(api_key, job["id"]), job, settings.JOB_RESULT_MINUTES)
+
+    async def _heartbeat(self, api_key: str, job: Dict) -> None:
+        """Publish progress and show the job is still alive"""
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            await self._save(api_key, job)
+
+    async def _collect(self, api_key: str, job: Dict, flag: bool, timezone: Optional[str]) -> List[Dict]:
+        rows = []
+        async for batch in EXPORT_DATASETS[job["dataset"]](self.client, api_key, flag, timezone):
+            rows.extend(batch)
+            job["rows"] = len(rows)
+        return rows
+
+    async def _run(self, api_key: str, job: Dict, flag: bool, timezone: Optional[str]) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(api_key, job))
+        try:
+            async with _slots():
+                job["status"] = JOB_RUNNING
+                await self._save(api_key, job)
+                rows = await asyncio.wait_for(
+                    self._collect(api_key, job, flag, timezone),
+                    timeout=settings.JOB_TIMEOUT_SECONDS
+                )
+
+            payload = to_table(rows) if job["format"] == TABLE_FORMAT else rows
+            # Kept compressed, the way most clients download it
+            body = await asyncio.to_thread(
+                lambda: gzip.compress(dumps(payload), compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+            )
+            if not await self.cache.set_bytes(self._result_key(api_key, job["id"]), body, settings.JOB_RESULT_MINUTES):
+                raise Exception("Result could not be stored, Redis is unavailable or the tenant's cache quota is exceeded")
+            job["status"] = JOB_SUCCEEDED
+
+        except asyncio.CancelledError:
+            job.update(status=JOB_FAILED, error="Job was cancelled because the server shut down")
+            raise
+        except asyncio.TimeoutError:
+            job.update(status=JOB_FAILED, error=f"Job timed out after {settings.JOB_TIMEOUT_SECONDS} seconds")
+        except Exception as e:
+            logging.error(f"Export job {job['id']} failed: {str(e)}", exc_info=True)
+            job.update(status=JOB_FAILED, error=str(e))
+        finally:
+            heartbeat.cancel()
+            job["finished_at"] = time.time()
+            await self._save(api_key, job)
+            logging.info(f"Export job {job['id']} ({job['dataset']}) {job['status']} with {job['rows']} rows")
+
+
+async def stop_export_jobs() -> None:
+    """Cancel the jobs running in this worker, marking them failed"""
+    for task in list(_job_tasks):
+        task.cancel()
+    await asyncio.gather(*_job_tasks, return_exceptions=True)
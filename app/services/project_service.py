@@ -1,19 +1,59 @@
 import httpx
 import asyncio
-from typing import List, Optional, Generator, Dict, Any
+from typing import AsyncIterator, List, Optional, Generator, Dict, Any
 from datetime import datetime
 import logging
-import json
 from itertools import islice
 from concurrent.futures import ThreadPoolExecutor
 from ..config import settings
 from ..models.project import Project
-from ..utils.timezone_utils import convert_utc_to_timezone
 from ..utils.redis_cache import RedisCache
+from ..utils.cached_dataset import CachedDataset
+from ..utils.http_client import get_http_client
+from ..utils.retry import RetryBudget, post_with_retry
+from ..utils.delta_sync import DeltaSync
+from ..utils.pipeline import pipelined
+from ..utils.serialization import loads
+
+PROJECT_DETAILS_FRAGMENT = """
+    fragment ProjectDetails on Project {
+        id
+        title
+        archivedOn
+        depth
+        createdOn
+        updatedOn
+        projectInfo {
+            projectId
+            number
+            customer
+            address1
+            address2
+            city
+            state
+            postalCode
+            phone
+            reminder
+            requireTimeEntryGps
+            additionalInfo
+            latitude
+            locationRadius
+            longitude
+        }
+        projectGroup {
+            groupName
+        }
+    }
+"""
+
+class ProjectService(CachedDataset):
+    cache_name = "project_data"
+    dataset_label = "projects"
 
-class ProjectService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.url = settings.BUSYBUSY_GRAPHQL_URL
+        self.client = client or get_http_client()
+        self.retry_budget = RetryBudget()
         self.batch_size = 500
         self.cache = RedisCache()
         self.processing_batch_size = 2000
@@ -28,90 +68,193 @@ class ProjectService:
 
     async def fetch_projects(self, api_key: str, is_archived: bool, timezone: str) -> List[Project]:
         """Fetch projects with Redis caching and batch processing"""
-        cache_key = f"project_data_{'archive' if is_archived else 'active'}"
-        
-        # Try cache first
-        cached_data = await self.cache.get_cached_data(cache_key)
-        if cached_data:
-            self.progress_logger.info(f"Using cached project data for {cache_key}")
-            # Convert timezone for cached data
-            return self._convert_timezone_for_projects(cached_data, timezone)
+        projects, _ = await self.fetch_with_version(api_key, is_archived, timezone)
+        return projects
 
-        try:
-            # Fetch all projects
-            all_projects = await self._fetch_all_projects(api_key, is_archived)
-            
-            if not all_projects:
-                return []
-
-            # Process projects in batches (without timezone conversion)
-            processed_projects = await self._process_projects_in_batches(all_projects, is_archived)
-
-            # Cache results (in UTC)
-            cache_minutes = 720 if is_archived else 10
-            await self.cache.set_cached_data(cache_key, processed_projects, cache_minutes)
-            
-            # Convert timezone before returning
-            return self._convert_timezone_for_projects(processed_projects, timezone)
-
-        except Exception as e:
-            logging.error(f"Error in fetch_projects: {str(e)}", exc_info=True)
-            raise
+    async def _load_rows(self, api_key: str, is_archived: bool) -> List[Dict]:
+        """Fetch and process all projects (timestamps stay in UTC)"""
+        # Root projects with their subtrees, refreshed from upstream changes
+        all_projects = await self._sync_projects(api_key, is_archived)
 
-    def _convert_timezone_for_projects(self, projects: List[Dict], timezone: str) -> List[Dict]:
-        """Convert UTC timestamps to specified timezone"""
-        converted_projects = []
-        for project in projects:
-            project_copy = project.copy()
-            project_copy['created_on'] = convert_utc_to_timezone(project['created_on'], timezone)
-            project_copy['updated_on'] = convert_utc_to_timezone(project['updated_on'], timezone)
-            converted_projects.append(project_copy)
-        return converted_projects
+        if not all_projects:
+            return []
 
-    async def _fetch_all_projects(self, api_key: str, is_archived: bool) -> List[Dict]:
+        # Process projects in batches (without timezone conversion)
+        return await self._process_projects_in_batches(all_projects, is_archived)
+
+    def _iter_rows(self, api_key: str, is_archived: bool) -> AsyncIterator[List[Dict]]:
+        # Root projects carry their whole subtree, so each page can be processed on its own
+        return pipelined(
+            self.iter_project_pages(api_key, is_archived),
+            lambda projects_data: self._process_projects_sync(projects_data, is_archived)
+        )
+
+    async def _sync_projects(self, api_key: str, is_archived: bool) -> List[Dict]:
+        """Raw root projects from the tenant's snapshot, synced with upstream changes"""
+        sync = DeltaSync(api_key, f"projects_{'archive' if is_archived else 'active'}")
+        return await sync.sync(
+            lambda: self._fetch_all_projects(api_key, is_archived),
+            lambda field, watermark: self._fetch_changed_roots(api_key, is_archived, field, watermark),
+            lambda root: root.get('depth') == 1 and bool(root.get('archivedOn')) == is_archived,
+            lambda root: (
+                (root.get('title') or '').casefold(),
+                ((root.get('projectInfo') or {}).get('projectId') or ''),
+                root.get('createdOn') or ''
+            )
+        )
+
+    async def _fetch_changed_roots(self, api_key: str, is_archived: bool, field: str, watermark: str) -> List[Dict]:
+        """Root projects (with subtrees) that contain a project changed since the watermark"""
+        changed_filter = {field: {"greaterThanOrEqual": watermark}}
+        if settings.PROJECT_FETCH_STRATEGY == "flat":
+            # Flat records carry no subtree, so changed roots are re-read as well
+            changed = await self._fetch_flat_projects(api_key, changed_filter)
+            roots = []
+        else:
+            changed = await self._fetch_all_projects(api_key, is_archived, changed_filter)
+            roots = [project for project in changed if project.get('depth') == 1]
+
+        fetched_ids = {root['id'] for root in roots}
+        missing_ids = list(dict.fromkeys(
+            root_id for root_id in (
+                project['id'] if project.get('depth') == 1 else project.get('rootProjectId')
+                for project in changed
+            )
+            if root_id and root_id not in fetched_ids
+        ))
+        # A changed sub-project is replaced by re-reading its whole root
+        for chunk in self._batch_generator(missing_ids, 100):
+            roots.extend(await self._fetch_all_projects(
+                api_key, is_archived, {"id": {"contains": chunk}, "depth": {"equal": 1}}
+            ))
+        return roots
+
+    async def _fetch_all_projects(self, api_key: str, is_archived: bool,
+                                  project_filter: Optional[Dict] = None) -> List[Dict]:
         """Fetch all projects from API with pagination"""
         all_projects = []
+        async for projects_data in self.iter_project_pages(api_key, is_archived, project_filter):
+            all_projects.extend(projects_data)
+        return all_projects
+
+    async def iter_project_pages(self, api_key: str, is_archived: bool,
+                                 project_filter: Optional[Dict] = None) -> AsyncIterator[List[Dict]]:
+        """Yield raw root project pages (with nested children) as they arrive"""
+        if settings.PROJECT_FETCH_STRATEGY == "flat":
+            # Trees are only complete once every flat page is in
+            roots = await self._fetch_flat_trees(api_key, is_archived, project_filter)
+            for page in self._batch_generator(roots, self.batch_size):
+                yield page
+            return
+
+        async for projects_data in self._iter_pages(
+            api_key, lambda after_cursor: self._build_graphql_query(is_archived, after_cursor, project_filter)
+        ):
+            yield projects_data
+
+    async def _iter_pages(self, api_key: str, build_query) -> AsyncIterator[List[Dict]]:
+        """Yield pages of a projects query built by build_query(after_cursor)"""
         after_cursor = None
         total_fetched = 0
 
         while True:
             try:
-                query = self._build_graphql_query(is_archived, after_cursor)
+                query = build_query(after_cursor)
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        self.url,
-                        json=query,
-                        headers={"key-authorization": api_key},
-                        timeout=60.0
-                    )
-                    
-                    if response.status_code != 200:
-                        raise Exception(f"HTTP {response.status_code}: {response.text}")
-
-                    data = response.json()
-                    projects_data = data.get("data", {}).get("projects", [])
-                    
-                    if not projects_data:
-                        break
-
-                    total_fetched += len(projects_data)
-                    self.progress_logger.info(f"Fetched {total_fetched} projects so far")
-                    
-                    all_projects.extend(projects_data)
-
-                    if len(projects_data) < self.batch_size:
-                        break
-
-                    after_cursor = projects_data[-1].get("cursor")
-                    if not after_cursor:
-                        break
+                response = await post_with_retry(
+                    self.client,
+                    self.url,
+                    self.retry_budget,
+                    json=query,
+                    headers={"key-authorization": api_key},
+                    timeout=60.0
+                )
+                
+                if response.status_code != 200:
+                    raise Exception(f"HTTP {response.status_code}: {response.text}")
+
+                data = loads(response.content)
+                projects_data = data.get("data", {}).get("projects", [])
 
             except Exception as e:
                 logging.error(f"Error fetching projects batch: {str(e)}")
                 raise
 
-        return all_projects
+            if not projects_data:
+                break
+
+            total_fetched += len(projects_data)
+            self.progress_logger.info(f"Fetched {total_fetched} projects so far")
+
+            yield projects_data
+
+            if len(projects_data) < self.batch_size:
+                break
+
+            after_cursor = projects_data[-1].get("cursor")
+            if not after_cursor:
+                break
+
+    async def _fetch_flat_projects(self, api_key: str, project_filter: Dict) -> List[Dict]:
+        """All projects matching project_filter at any depth, without children"""
+        projects = []
+        async for projects_data in self._iter_pages(
+            api_key, lambda after_cursor: self._build_flat_query(after_cursor, project_filter)
+        ):
+            projects.extend(projects_data)
+        return projects
+
+    async def _fetch_flat_trees(self, api_key: str, is_archived: bool,
+                                root_filter: Optional[Dict] = None) -> List[Dict]:
+        """Root projects with their subtrees, fetched flat and assembled locally"""
+        status_filter = {"archivedOn": {"isNull": not is_archived}}
+        if root_filter is None:
+            # Every project with the requested status, roots included
+            projects = await self._fetch_flat_projects(api_key, status_filter)
+        else:
+            projects = await self._fetch_flat_projects(api_key, root_filter)
+            root_ids = [project['id'] for project in projects if project.get('depth') == 1]
+            for chunk in self._batch_generator(root_ids, 100):
+                projects.extend(await self._fetch_flat_projects(api_key, {
+                    **status_filter, "rootProjectId": {"contains": chunk}, "depth": {"greaterThan": 1}
+                }))
+        return self._assemble_trees(projects)
+
+    def _assemble_trees(self, projects: List[Dict]) -> List[Dict]:
+        """Nest flat projects under their parents in linear time, returning the roots in fetch order.
+
+        A project whose parent was not fetched (the parent has the other
+        archived status) is dropped with its subtree, like the nested
+        query's child filter drops it.
+        """
+        nodes: Dict[str, Dict] = {}
+        parent_ids: Dict[str, Optional[str]] = {}
+        for project in projects:
+            if project['id'] in nodes:
+                continue
+            parent_depth = (project.get('depth') or 1) - 1
+            parent_ids[project['id']] = next(
+                (ancestor.get('id') for ancestor in project.get('ancestors') or []
+                 if ancestor.get('depth') == parent_depth),
+                None
+            )
+            node = {key: value for key, value in project.items() if key != 'ancestors'}
+            node['children'] = []
+            nodes[project['id']] = node
+
+        roots = []
+        dropped = 0
+        for project_id, node in nodes.items():
+            if node.get('depth') == 1:
+                roots.append(node)
+            elif (parent := nodes.get(parent_ids[project_id])) is not None:
+                parent['children'].append(node)
+            else:
+                dropped += 1
+
+        if dropped:
+            self.progress_logger.info(f"Dropped {dropped} projects whose parent has another archived status")
+        return roots
 
     async def _process_projects_in_batches(self, projects: List[Dict], is_archived: bool) -> List[Dict]:
         """Process projects in batches using thread pool"""
@@ -200,6 +343,8 @@ class ProjectService:
                     "postal_code": info.get('postalCode', ''),
                     "phone": info.get('phone', ''),
                     "project_names": cleaned_names[:7],
+                    # Levels below the seventh, empty for all but very deep trees
+                    "deeper_project_names": cleaned_names[7:],
                     "group_name": group.get('groupName', ''),
                     "latitude": info.get('latitude',''),
                     "longitude": info.get('longitude', ''),
@@ -245,15 +390,15 @@ class ProjectService:
             if not project:
                 return result
 
-            current_names = project_names.copy()
-            current_names[depth] = project.get('title', '')
+            # Names of the ancestors followed by this project's, however deep it is
+            current_names = project_names[:depth] + [project.get('title', '')]
 
             # Pass is_root flag to format_project_data
             if formatted_data := format_project_data(project, current_names):
                 result.append(formatted_data)
             
-            # Filter is_archived children from project
-            project = filter_children(project)
+            # Filter is_archived children from a copy, the raw project may be shared via the local cache
+            project = filter_children(project.copy())
             
             children = project.get('children', [])
             if not children:
@@ -271,7 +416,7 @@ class ProjectService:
             # Process hierarchy
             result = []
             for project in projects:
-                result.extend(process_hierarchy(project, 0, [""] * 7))
+                result.extend(process_hierarchy(project, 0, []))
 
             return result
 
@@ -279,7 +424,9 @@ class ProjectService:
             logging.error(f"Error in prepare_hierarchy: {e}")
             return []
 
-    def _build_graphql_query(self, is_archived: bool, after_cursor: Optional[str]) -> dict:
+    def _build_graphql_query(self, is_archived: bool, after_cursor: Optional[str],
+                             project_filter: Optional[Dict] = None) -> dict:
+        """Build the nested projects query; project_filter replaces the root filter"""
         return {
             "query": """
                 query FetchProjects($filter: ProjectFilter, $first: Int, $after: String, $sort: [ProjectSort!]) {
@@ -289,6 +436,7 @@ class ProjectService:
                         title
                         archivedOn
                         depth
+                        rootProjectId
                         createdOn
                         updatedOn
                         children {              
@@ -312,37 +460,9 @@ class ProjectService:
                         ...ProjectDetails
                     }
                 }
-                fragment ProjectDetails on Project {
-                    id
-                    title
-                    archivedOn
-                    depth
-                    createdOn
-                    updatedOn
-                    projectInfo {
-                        projectId
-                        number
-                        customer
-                        address1
-                        address2
-                        city
-                        state
-                        postalCode
-                        phone
-                        reminder
-                        requireTimeEntryGps
-                        additionalInfo
-                        latitude
-                        locationRadius
-                        longitude
-                    }
-                    projectGroup {
-                        groupName
-                    }
-                }
-            """,
+            """ + PROJECT_DETAILS_FRAGMENT,
             "variables": {
-                "filter": {
+                "filter": project_filter or {
                     "archivedOn": {"isNull": not is_archived},
                     "depth": {"equal": 1},
                 },
@@ -355,3 +475,31 @@ class ProjectService:
                 "after": after_cursor
             }
         }
+
+    def _build_flat_query(self, after_cursor: Optional[str], project_filter: Dict) -> dict:
+        """Build a projects query without children; ancestors identify each parent"""
+        return {
+            "query": """
+                query FetchProjectsFlat($filter: ProjectFilter, $first: Int, $after: String, $sort: [ProjectSort!]) {
+                    projects(filter: $filter, first: $first, after: $after, sort: $sort) {
+                        cursor
+                        rootProjectId
+                        ancestors {
+                            id
+                            depth
+                        }
+                        ...ProjectDetails
+                    }
+                }
+            """ + PROJECT_DETAILS_FRAGMENT,
+            "variables": {
+                "filter": project_filter,
+                "sort": [
+                    {"title": "asc"},
+                    {"projectInfo": {"projectId": "asc"}},
+                    {"createdOn": "asc"}
+                ],
+                "first": self.batch_size,
+                "after": after_cursor
+            }
+        }
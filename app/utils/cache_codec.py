@@ -0,0 +1,156 @@
+import gzip
+import logging
+import struct
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from ..config import settings
+from .serialization import dumps, loads
+
+# Binary cache payload layout:
+#   magic (3 bytes) | format version | serializer id | compression id | raw size (uint64) | body
+# Entries that do not start with the magic (plain JSON written by older
+# releases) or carry an unknown version or codec id are skipped as misses.
+MAGIC = b"BBC"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct(">3sBBBQ")
+
+SERIALIZERS = {"orjson": 1, "msgpack": 2}
+COMPRESSIONS = {"none": 0, "gzip": 1, "zstd": 2}
+
+
+def _msgpack_module():
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        return None
+
+
+def _zstd_module():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def _serializer_functions(serializer_id: int) -> Optional[Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    if serializer_id == SERIALIZERS["orjson"]:
+        return dumps, loads
+    msgpack = _msgpack_module()
+    if serializer_id == SERIALIZERS["msgpack"] and msgpack:
+        return (lambda data: msgpack.packb(data, use_bin_type=True),
+                lambda raw: msgpack.unpackb(raw, raw=False))
+    return None
+
+
+def _compression_functions(compression_id: int) -> Optional[Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    if compression_id == COMPRESSIONS["none"]:
+        return (lambda raw: raw), (lambda body: body)
+    if compression_id == COMPRESSIONS["gzip"]:
+        level = settings.CACHE_COMPRESSION_LEVEL or 1
+        return (lambda raw: gzip.compress(raw, compresslevel=level, mtime=0)), gzip.decompress
+    zstandard = _zstd_module()
+    if compression_id == COMPRESSIONS["zstd"] and zstandard:
+        level = settings.CACHE_COMPRESSION_LEVEL or 3
+        return (lambda raw: zstandard.ZstdCompressor(level=level).compress(raw),
+                lambda body: zstandard.ZstdDecompressor().decompress(body))
+    return None
+
+
+def _configured_codec() -> Tuple[str, str]:
+    """Serializer and compression from settings, falling back when a package is missing"""
+    serializer = settings.CACHE_SERIALIZER
+    if serializer not in SERIALIZERS or (serializer == "msgpack" and not _msgpack_module()):
+        logging.warning(f"Cache serializer '{serializer}' is not available, using orjson")
+        serializer = "orjson"
+
+    compression = settings.CACHE_COMPRESSION
+    if compression not in COMPRESSIONS or (compression == "zstd" and not _zstd_module()):
+        logging.warning(f"Cache compression '{compression}' is not available, using gzip")
+        compression = "gzip"
+
+    return serializer, compression
+
+
+class CodecMetrics:
+    """Running totals of cache encode/decode work in this worker"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.encoded = 0
+        self.decoded = 0
+        self.skipped = 0
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "skipped": self.skipped,
+            "raw_bytes": self.raw_bytes,
+            "encoded_bytes": self.encoded_bytes,
+            "compression_ratio": round(self.raw_bytes / self.encoded_bytes, 2) if self.encoded_bytes else None,
+            "avg_encode_ms": round(self.encode_seconds * 1000 / self.encoded, 3) if self.encoded else None,
+            "avg_decode_ms": round(self.decode_seconds * 1000 / self.decoded, 3) if self.decoded else None,
+        }
+
+
+class CacheCodec:
+    """Serialize and compress cache payloads behind a versioned header"""
+
+    def __init__(self):
+        self.serializer, self.compression = _configured_codec()
+        self.serializer_id = SERIALIZERS[self.serializer]
+        self.compression_id = COMPRESSIONS[self.compression]
+        self.metrics = CodecMetrics()
+
+    def encode(self, data: Any) -> bytes:
+        start = time.perf_counter()
+        serialize, _ = _serializer_functions(self.serializer_id)
+        compress, _ = _compression_functions(self.compression_id)
+        raw = serialize(data)
+        blob = _HEADER.pack(MAGIC, FORMAT_VERSION, self.serializer_id, self.compression_id, len(raw)) + compress(raw)
+
+        self.metrics.encoded += 1
+        self.metrics.raw_bytes += len(raw)
+        self.metrics.encoded_bytes += len(blob)
+        self.metrics.encode_seconds += time.perf_counter() - start
+        return blob
+
+    def decode(self, blob: bytes) -> Optional[Any]:
+        """Decode a payload, None if it was written in another format"""
+        header = self.read_header(blob)
+        if header is None:
+            self.metrics.skipped += 1
+            return None
+
+        start = time.perf_counter()
+        serializer_id, compression_id, _ = header
+        _, deserialize = _serializer_functions(serializer_id)
+        _, decompress = _compression_functions(compression_id)
+        data = deserialize(decompress(memoryview(blob)[_HEADER.size:]))
+
+        self.metrics.decoded += 1
+        self.metrics.decode_seconds += time.perf_counter() - start
+        return data
+
+    def read_header(self, blob: bytes) -> Optional[Tuple[int, int, int]]:
+        """Serializer id, compression id and raw size, None for unknown formats"""
+        if len(blob) < _HEADER.size:
+            return None
+        magic, version, serializer_id, compression_id, raw_size = _HEADER.unpack_from(blob)
+        if (magic != MAGIC or version != FORMAT_VERSION
+                or _serializer_functions(serializer_id) is None
+                or _compression_functions(compression_id) is None):
+            return None
+        return serializer_id, compression_id, raw_size
+
+
+# Shared by every RedisCache in this worker
+cache_codec = CacheCodec()
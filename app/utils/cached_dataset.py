@@ -0,0 +1,98 @@
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from .redis_cache import RedisCache
+from .tenant_cache import tenant_cache_key, tenant_ttl_minutes
+from .timezone_utils import convert_rows_to_timezone
+
+
+class CachedDataset:
+    """Mixin for services that cache one list of formatted rows per tenant.
+
+    Rows are cached with UTC timestamps under
+    tenant:<fingerprint>:<cache_name>_<active|inactive_name>, so one copy
+    serves every timezone. Services set cache_name and dataset_label,
+    provide self.cache and self.batch_size, and implement _load_rows; the
+    ones that can stream also implement _iter_rows. The flag argument is
+    is_archived (is_deleted for equipment).
+    """
+
+    cache: RedisCache
+    batch_size: int
+    cache_name: str
+    dataset_label: str
+    inactive_name = "archive"
+
+    def cache_key(self, api_key: str, flag: bool) -> str:
+        """Cache key of the tenant's formatted rows"""
+        return tenant_cache_key(api_key, f"{self.cache_name}_{self.inactive_name if flag else 'active'}")
+
+    async def _load_rows(self, api_key: str, flag: bool) -> List[Dict]:
+        """Fetch and format all rows from upstream (timestamps stay in UTC)"""
+        raise NotImplementedError
+
+    def _iter_rows(self, api_key: str, flag: bool) -> AsyncIterator[List[Dict]]:
+        """Yield formatted rows one upstream page at a time (timestamps stay in UTC)"""
+        raise NotImplementedError
+
+    async def cached_version(self, api_key: str, flag: bool) -> Optional[str]:
+        """Content version of the cached rows, None when nothing is cached"""
+        return await self.cache.get_version(
+            self.cache_key(api_key, flag),
+            lambda: self._load_rows(api_key, flag),
+            *tenant_ttl_minutes(api_key, flag)
+        )
+
+    async def warm_cache(self, api_key: str, flag: bool, refresh_within: float) -> Optional[float]:
+        """Refresh the cached rows ahead of their soft TTL, returning the seconds until they are stale"""
+        return await self.cache.refresh_ahead(
+            self.cache_key(api_key, flag),
+            lambda: self._load_rows(api_key, flag),
+            *tenant_ttl_minutes(api_key, flag),
+            refresh_within
+        )
+
+    async def fetch_with_version(self, api_key: str, flag: bool,
+                                 timezone: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Rows along with the version of the cached data they were read from.
+
+        Stale data is served and refreshed in the background; on a miss only
+        one caller per cache key crawls upstream. Timestamps are converted
+        to timezone after the cache, when one is given.
+        """
+        try:
+            rows, version = await self.cache.get_or_fetch_versioned(
+                self.cache_key(api_key, flag),
+                lambda: self._load_rows(api_key, flag),
+                *tenant_ttl_minutes(api_key, flag)
+            )
+            if not rows:
+                return [], None
+            return (convert_rows_to_timezone(rows, timezone) if timezone else rows), version
+
+        except Exception as e:
+            logging.error(f"Error fetching {self.dataset_label}: {str(e)}", exc_info=True)
+            raise
+
+    async def stream_rows(self, api_key: str, flag: bool, timezone: str) -> AsyncIterator[List[Dict]]:
+        """Yield formatted rows one upstream page at a time, or from cache"""
+        cache_key = self.cache_key(api_key, flag)
+        soft_minutes, hard_minutes = tenant_ttl_minutes(api_key, flag)
+
+        cached_rows, is_stale = await self.cache.get_cached_entry(cache_key)
+        if cached_rows:
+            if is_stale:
+                self.cache.refresh_in_background(
+                    cache_key, lambda: self._load_rows(api_key, flag), soft_minutes, hard_minutes
+                )
+            for start in range(0, len(cached_rows), self.batch_size):
+                yield convert_rows_to_timezone(cached_rows[start:start + self.batch_size], timezone)
+            return
+
+        rows = []
+        async for processed in self._iter_rows(api_key, flag):
+            rows.extend(processed)
+            yield convert_rows_to_timezone(processed, timezone)
+
+        # A complete crawl is as good as a regular fetch, so keep it (in UTC)
+        if rows:
+            await self.cache.set_cached_data(cache_key, rows, hard_minutes, soft_minutes)
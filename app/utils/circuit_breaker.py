@@ -0,0 +1,64 @@
+import time
+import logging
+from typing import Optional
+
+
+class CircuitBreaker:
+    """Stop calling a failing dependency for a while.
+
+    After failure_threshold consecutive failures the breaker opens and
+    allow_request() returns False. Once reset_seconds have passed a single
+    trial call is let through; its success closes the breaker again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_started_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow_request(self) -> bool:
+        if self._opened_at is None:
+            return True
+
+        now = time.monotonic()
+        if now - self._opened_at < self.reset_seconds:
+            return False
+
+        # Half-open: allow one trial call per reset period
+        if self._trial_started_at is None or now - self._trial_started_at >= self.reset_seconds:
+            self._trial_started_at = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logging.info(f"Circuit breaker '{self.name}' closed")
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started_at = None
+
+    def trip(self) -> None:
+        """Open the breaker without waiting for failure_threshold failures"""
+        if self._opened_at is None:
+            logging.warning(f"Circuit breaker '{self.name}' opened, retrying in {self.reset_seconds}s")
+        self._failures = max(self._failures, self.failure_threshold)
+        self._opened_at = time.monotonic()
+        self._trial_started_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_started_at = None
+        if self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logging.warning(
+                    f"Circuit breaker '{self.name}' opened after {self._failures} failures, "
+                    f"retrying in {self.reset_seconds}s"
+                )
+            self._opened_at = time.monotonic()
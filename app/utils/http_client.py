@@ -0,0 +1,76 @@
+import httpx
+import asyncio
+import logging
+from typing import Optional
+from ..config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_supported() -> bool:
+    """Check whether the optional h2 package is installed"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled client for the BusyBusy GraphQL API"""
+    http2 = settings.HTTP2_ENABLED
+    if http2 and not _http2_supported():
+        logging.warning("HTTP2_ENABLED is set but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=http2,
+        timeout=httpx.Timeout(60.0, connect=settings.HTTP_CONNECT_TIMEOUT)
+    )
+
+
+async def warm_up_http_client(client: httpx.AsyncClient, connections: int) -> None:
+    """Open connections to the upstream ahead of the first request"""
+    if connections <= 0:
+        return
+
+    async def _open_connection():
+        try:
+            await client.head(settings.BUSYBUSY_GRAPHQL_URL, timeout=settings.HTTP_CONNECT_TIMEOUT)
+        except httpx.HTTPError as e:
+            logging.warning(f"HTTP client warm-up request failed: {str(e)}")
+
+    await asyncio.gather(*[_open_connection() for _ in range(connections)])
+    logging.info(f"Warmed up {connections} upstream connections")
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the application-wide client and warm up its pool"""
+    global _client
+    if _client is None:
+        _client = create_http_client()
+        await warm_up_http_client(_client, settings.HTTP_WARMUP_CONNECTIONS)
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the application-wide client and release its connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if the app lifespan has not run"""
+    global _client
+    if _client is None:
+        logging.warning("Shared HTTP client not started, creating it lazily")
+        _client = create_http_client()
+    return _client
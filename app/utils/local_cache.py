@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from ..config import settings
+
+
+class LocalCache:
+    """In-process LRU of decoded cache payloads, bounded in bytes.
+
+    Sizes are the serialized payload sizes, an estimate of what an entry
+    costs in memory. Entries expire after their own TTL, capped at
+    LOCAL_CACHE_TTL_SECONDS. The cache only answers while `active` is set,
+    which the Redis invalidation listener does while it is subscribed, so
+    workers never serve a value another worker has replaced.
+
+    A value read from Redis may be overtaken by an invalidation before it
+    is stored here. Readers take a sequence() before the read and pass it
+    to set(), which drops the value if the key was invalidated since.
+    """
+
+    # Invalidation sequence numbers remembered per key before they are pruned
+    MAX_TRACKED_INVALIDATIONS = 10000
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.active = False
+        self._entries: "OrderedDict[str, Tuple[Any, float, int, Optional[str]]]" = OrderedDict()
+        self._bytes = 0
+        self._sequence = 0
+        self._invalidated_at: Dict[str, int] = {}
+        # Reads started before this sequence can't tell which keys changed
+        self._pruned_at = 0
+
+    def sequence(self) -> int:
+        """Current invalidation sequence, taken before reading a value to store"""
+        return self._sequence
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a stored value and mark it as recently used"""
+        if not self.active:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at, _, _ = entry
+        if time.time() >= expires_at:
+            self._drop(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, size: int, expires_at: float,
+            read_at: Optional[int] = None, version: Optional[str] = None) -> None:
+        """Store a decoded value, evicting least recently used entries to fit.
+
+        read_at is the sequence() taken before the value was read; the value
+        is skipped if the key was invalidated after that.
+        """
+        if not self.active or size > self.max_bytes:
+            return
+        if read_at is not None and max(self._pruned_at, self._invalidated_at.get(key, 0)) > read_at:
+            return
+
+        self._drop(key)
+        expires_at = min(expires_at, time.time() + settings.LOCAL_CACHE_TTL_SECONDS)
+        self._entries[key] = (value, expires_at, size, version)
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def invalidate(self, key: str, version: Optional[str] = None) -> None:
+        """Drop key, unless a version is given and the stored copy already has it"""
+        self._sequence += 1
+        self._invalidated_at[key] = self._sequence
+        if len(self._invalidated_at) > self.MAX_TRACKED_INVALIDATIONS:
+            self._invalidated_at.clear()
+            self._pruned_at = self._sequence
+
+        entry = self._entries.get(key)
+        if entry is not None and (version is None or entry[3] != version):
+            self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        self._sequence += 1
+        self._invalidated_at.clear()
+        self._pruned_at = self._sequence
+
+
+# Shared by every RedisCache in this worker
+local_cache = LocalCache(settings.LOCAL_CACHE_MAX_BYTES)
@@ -0,0 +1,93 @@
+import base64
+import json
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+from ..config import settings
+from .redis_cache import RedisCache
+from .tenant_cache import tenant_cache_key
+
+
+class InvalidPageToken(Exception):
+    """The page_token could not be decoded or belongs to another dataset"""
+
+
+class PageTokenExpired(InvalidPageToken):
+    """The snapshot behind a page_token is no longer available"""
+
+
+class SnapshotUnavailable(Exception):
+    """The result could not be snapshotted, so it cannot be paginated right now"""
+
+
+class SnapshotPaginator:
+    """Serve a result set page by page from a snapshot stored in Redis.
+
+    The first request materializes the full result as a Redis list and
+    returns its first page; the opaque page_token points into that list,
+    so later pages are plain LRANGE reads and never re-crawl upstream.
+    Snapshots live in the tenant's cache namespace, so a token only works
+    for the tenant that created it.
+    """
+
+    def __init__(self, api_key: str, dataset: str):
+        self.dataset = dataset
+        self.api_key = api_key
+        self.cache = RedisCache()
+
+    def _snapshot_key(self, snapshot_id: str) -> str:
+        return tenant_cache_key(self.api_key, f"snapshot:{snapshot_id}")
+
+    def _encode_token(self, snapshot_id: str, offset: int) -> str:
+        raw = json.dumps({"d": self.dataset, "s": snapshot_id, "o": offset}).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def _decode_token(self, page_token: str) -> Dict[str, Any]:
+        try:
+            padded = page_token + "=" * (-len(page_token) % 4)
+            token = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            snapshot_id, offset = str(token["s"]), int(token["o"])
+        except Exception:
+            raise InvalidPageToken("Invalid page_token")
+
+        if token.get("d") != self.dataset or offset < 0:
+            raise InvalidPageToken("page_token does not belong to this endpoint")
+        return {"snapshot_id": snapshot_id, "offset": offset}
+
+    def _page(self, rows: List[Dict], snapshot_id: Optional[str], offset: int, total: int) -> Dict:
+        next_offset = offset + len(rows)
+        has_more = snapshot_id is not None and next_offset < total
+        return {
+            "data": rows,
+            "total": total,
+            "next_page_token": self._encode_token(snapshot_id, next_offset) if has_more else None
+        }
+
+    async def create(self, rows: List[Dict], limit: int) -> Dict:
+        """Snapshot the full result and return its first page"""
+        if len(rows) <= limit:
+            return self._page(rows, None, 0, len(rows))
+
+        snapshot_id = uuid.uuid4().hex
+        stored = await self.cache.set_list(
+            self._snapshot_key(snapshot_id), rows, settings.PAGE_SNAPSHOT_MINUTES
+        )
+        if not stored:
+            # Without a snapshot later pages could not be served; returning
+            # every row instead would ignore the limit the client asked for
+            logging.error(f"Could not store {self.dataset} snapshot of {len(rows)} rows")
+            raise SnapshotUnavailable("Pagination is temporarily unavailable, retry shortly")
+
+        return self._page(rows[:limit], snapshot_id, 0, len(rows))
+
+    async def get_page(self, page_token: str, limit: int) -> Dict:
+        """Read the page a token points at from its snapshot"""
+        token = self._decode_token(page_token)
+        result = await self.cache.get_list_range(
+            self._snapshot_key(token["snapshot_id"]), token["offset"], limit
+        )
+        if result is None:
+            raise PageTokenExpired("page_token has expired, restart from the first page")
+
+        rows, total = result
+        return self._page(rows, token["snapshot_id"], token["offset"], total)
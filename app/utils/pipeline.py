@@ -0,0 +1,41 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from ..config import settings
+
+_DONE = object()
+
+
+async def pipelined(pages: AsyncIterator[List[Dict]], transform: Callable[[List[Dict]], List[Dict]],
+                    prefetch: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+    """Yield transform(page) for every page, fetching ahead while pages are transformed.
+
+    A producer task keeps up to `prefetch` raw pages queued, so the request
+    for page N+1 is in flight while page N is transformed in a worker thread
+    and consumed. A crawl then takes about max(fetch, transform) per page
+    instead of their sum, and at most a few raw pages are held at once.
+    Upstream errors are raised after the pages that came before them.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(prefetch or settings.PIPELINE_PREFETCH_PAGES, 1))
+
+    async def produce() -> None:
+        try:
+            async for page in pages:
+                await queue.put(page)
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield await asyncio.to_thread(transform, item)
+    finally:
+        # Stop fetching when the consumer gives up early
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
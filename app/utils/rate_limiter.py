@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from ..config import settings
+from .redis_cache import RedisCache
+from .tenant_cache import tenant_fingerprint
+
+# Token bucket that always hands out the token and returns how long the caller
+# must wait for it: a negative balance queues callers in arrival order instead
+# of having them poll. Redis time keeps workers on different hosts in step.
+_TOKEN_BUCKET_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('hmget', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate) - 1
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('pexpire', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+def _rate_limit_key(fingerprint: str) -> str:
+    return f"ratelimit:{fingerprint}"
+
+
+class UpstreamRateLimiter:
+    """Pace upstream calls per API key, across every service and worker.
+
+    Each API-key fingerprint has a token bucket in Redis refilled at
+    UPSTREAM_RATE_LIMIT_PER_SECOND up to UPSTREAM_RATE_LIMIT_BURST tokens;
+    every upstream request takes one token, waiting for it when the bucket
+    is empty. While Redis is unavailable each worker falls back to a local
+    bucket with the same settings.
+    """
+
+    def __init__(self):
+        self._local: Dict[str, Tuple[float, float]] = {}
+
+    async def acquire(self, api_key: str) -> None:
+        rate = settings.UPSTREAM_RATE_LIMIT_PER_SECOND
+        if rate <= 0 or not api_key:
+            return
+
+        fingerprint = tenant_fingerprint(api_key)
+        burst = max(settings.UPSTREAM_RATE_LIMIT_BURST, 1)
+        wait = await self._reserve_shared(fingerprint, rate, burst)
+        if wait is None:
+            wait = self._reserve_local(fingerprint, rate, burst)
+
+        if wait > 0:
+            if wait >= 1:
+                logging.info(f"Upstream rate limit reached for tenant {fingerprint[:8]}, waiting {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    async def _reserve_shared(self, fingerprint: str, rate: float, burst: int) -> Optional[float]:
+        result = await RedisCache().run_script(_TOKEN_BUCKET_SCRIPT, [_rate_limit_key(fingerprint)], [rate, burst])
+        return float(result) if result is not None else None
+
+    def _reserve_local(self, fingerprint: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._local.get(fingerprint, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate) - 1
+        self._local[fingerprint] = (tokens, now)
+        return -tokens / rate if tokens < 0 else 0.0
+
+
+# Shared by every upstream call in this worker
+upstream_rate_limiter = UpstreamRateLimiter()
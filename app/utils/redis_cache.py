@@ -1,49 +1,733 @@
-import redis
-import json
+import redis.asyncio as redis
+import hashlib
+import time
+import uuid
+import asyncio
 import logging
 from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from ..config import settings
+from .circuit_breaker import CircuitBreaker
+from .serialization import dumps, loads
+from .tenant_cache import tenant_max_bytes, tenant_of_key
+from .local_cache import local_cache
+from .cache_codec import cache_codec
+
+# Release/extend a lock only if it still holds our token
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Byte accounting of tenant cache entries: global and per-tenant LRU sorted sets
+# (scored by last access), entry sizes and running byte totals. The {cache}
+# hash tag keeps them in one Redis Cluster slot, so the scripts below can
+# update them together; entry keys are only members there, passed in ARGV
+CACHE_LRU_KEY = "{cache}:lru"
+CACHE_SIZES_KEY = "{cache}:sizes"
+CACHE_TENANT_BYTES_KEY = "{cache}:tenant_bytes"
+CACHE_TOTAL_BYTES_KEY = "{cache}:total_bytes"
+_ACCOUNTING_KEYS = [CACHE_SIZES_KEY, CACHE_LRU_KEY, CACHE_TENANT_BYTES_KEY, CACHE_TOTAL_BYTES_KEY]
+
+# Record a write, then evict least recently used entries until the tenant
+# quota and the global limit hold again; never evicts the entry just written.
+# Evicted entries are dropped from the accounting and returned: the caller
+# deletes them and removes them from their own tenant's LRU set
+_RECORD_WRITE_SCRIPT = """
+local sizes, lru, tenant_bytes, total_bytes, tenant_lru = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5]
+local key, fingerprint, size, now = ARGV[1], ARGV[2], tonumber(ARGV[3]), tonumber(ARGV[4])
+local tenant_max, global_max = tonumber(ARGV[5]), tonumber(ARGV[6])
+
+local old_size = tonumber(redis.call('hget', sizes, key) or '0')
+redis.call('hset', sizes, key, size)
+local tenant_total = redis.call('hincrby', tenant_bytes, fingerprint, size - old_size)
+local total = redis.call('incrby', total_bytes, size - old_size)
+redis.call('zadd', lru, now, key)
+redis.call('zadd', tenant_lru, now, key)
+
+local evicted = {}
+local function evict(victim)
+    local victim_size = tonumber(redis.call('hget', sizes, victim) or '0')
+    local victim_tenant = string.match(victim, '^tenant:([^:]+):')
+    redis.call('hdel', sizes, victim)
+    redis.call('zrem', lru, victim)
+    redis.call('zrem', tenant_lru, victim)
+    local remaining = redis.call('hincrby', tenant_bytes, victim_tenant, -victim_size)
+    if victim_tenant == fingerprint then
+        tenant_total = remaining
+    end
+    total = redis.call('incrby', total_bytes, -victim_size)
+    table.insert(evicted, victim)
+end
+
+while tenant_max > 0 and tenant_total > tenant_max do
+    local oldest = redis.call('zrange', tenant_lru, 0, 0)[1]
+    if not oldest or oldest == key then break end
+    evict(oldest)
+end
+while global_max > 0 and total > global_max do
+    local oldest = redis.call('zrange', lru, 0, 0)[1]
+    if not oldest or oldest == key then break end
+    evict(oldest)
+end
+return evicted
+"""
+_TOUCH_SCRIPT = """
+if redis.call('hexists', KEYS[1], ARGV[1]) == 1 then
+    redis.call('zadd', KEYS[2], ARGV[2], ARGV[1])
+    redis.call('zadd', KEYS[3], ARGV[2], ARGV[1])
+end
+return 0
+"""
+# Drop accounting of an entry that expired on its own
+_FORGET_SCRIPT = """
+local sizes, lru, tenant_bytes, total_bytes, tenant_lru = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5]
+local size = redis.call('hget', sizes, ARGV[1])
+if not size then
+    return 0
+end
+redis.call('hdel', sizes, ARGV[1])
+redis.call('zrem', lru, ARGV[1])
+redis.call('zrem', tenant_lru, ARGV[1])
+redis.call('hincrby', tenant_bytes, ARGV[2], -tonumber(size))
+redis.call('incrby', total_bytes, -tonumber(size))
+return 1
+"""
+
+# Fetches in flight in this worker, shared by every RedisCache instance
+_inflight: Dict[str, asyncio.Future] = {}
+# Strong references to background refreshes so they are not garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+
+_pool: Optional[redis.ConnectionPool] = None
+_invalidation_listener: Optional[asyncio.Task] = None
+# Identifies this worker's own messages on the invalidation channel
+WORKER_ID = uuid.uuid4().hex
+redis_breaker = CircuitBreaker(
+    "redis",
+    settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+    settings.REDIS_BREAKER_RESET_SECONDS
+)
+
+
+def create_redis_pool() -> redis.ConnectionPool:
+    """Create the connection pool shared by every RedisCache
+
+    A full pool raises right away instead of queueing callers, so a stalled
+    Redis turns into fast cache misses rather than requests waiting on it.
+    """
+    return redis.ConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        decode_responses=False,  # Cache payloads are binary, see cache_codec
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=30
+    )
+
+
+async def start_redis_pool() -> redis.ConnectionPool:
+    """Create the application-wide pool and check that Redis answers"""
+    global _pool
+    if _pool is None:
+        _pool = create_redis_pool()
+        try:
+            await redis.Redis(connection_pool=_pool).ping()
+        except Exception as e:
+            logging.error(f"Redis connection failed: {str(e)}")
+            # Skip Redis from the first request instead of after a run of failures
+            redis_breaker.trip()
+    return _pool
+
+
+async def close_redis_pool() -> None:
+    """Close all pooled Redis connections"""
+    global _pool
+    if _pool is not None:
+        await _pool.disconnect()
+        _pool = None
+
+
+def get_redis_client() -> redis.Redis:
+    """Return a client backed by the shared pool, creating it if the app lifespan has not run"""
+    global _pool
+    if _pool is None:
+        _pool = create_redis_pool()
+    return redis.Redis(connection_pool=_pool)
+
+
+async def start_cache_invalidation() -> None:
+    """Start listening for cache writes of other workers"""
+    global _invalidation_listener
+    if _invalidation_listener is None and settings.LOCAL_CACHE_MAX_BYTES > 0:
+        _invalidation_listener = asyncio.create_task(_listen_for_invalidations())
+
+
+async def stop_cache_invalidation() -> None:
+    global _invalidation_listener
+    if _invalidation_listener is not None:
+        _invalidation_listener.cancel()
+        try:
+            await _invalidation_listener
+        except asyncio.CancelledError:
+            pass
+        _invalidation_listener = None
+    local_cache.active = False
+
+
+async def _listen_for_invalidations() -> None:
+    """Drop local copies of keys other workers wrote.
+
+    The local tier is only used while subscribed: after a disconnect it is
+    cleared, since invalidations may have been missed.
+    """
+    while True:
+        pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            local_cache.clear()
+            local_cache.active = True
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                origin, _, key = message["data"].decode().partition(" ")
+                key, _, version = key.partition(" ")
+                if origin != WORKER_ID:
+                    local_cache.invalidate(key, version or None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Cache invalidation listener error: {str(e)}")
+            await asyncio.sleep(settings.REDIS_BREAKER_RESET_SECONDS / 6)
+        finally:
+            local_cache.active = False
+            local_cache.clear()
+            await pubsub.aclose()
+
+
+def data_version(data: Any) -> str:
+    """Content hash of cached data; identical data always gets the same version"""
+    return hashlib.blake2b(dumps(data), digest_size=16).hexdigest()
+
+
+def _tenant_lru_key(fingerprint: str) -> str:
+    return f"{{cache}}:lru:{fingerprint}"
+
 
 class RedisCache:
     def __init__(self):
         try:
-            self.redis_client = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                db=settings.REDIS_DB,
-                decode_responses=True
-            )
+            self.redis_client = get_redis_client()
         except Exception as e:
             logging.error(f"Redis connection failed: {str(e)}")
             self.redis_client = None
 
+    def _available(self) -> bool:
+        """Whether Redis should be used, skipping it while the breaker is open"""
+        return self.redis_client is not None and redis_breaker.allow_request()
+
+    async def _call(self, command: str, *args, **kwargs) -> Any:
+        """Run a Redis command and report the outcome to the circuit breaker"""
+        try:
+            result = await getattr(self.redis_client, command)(*args, **kwargs)
+        except Exception:
+            redis_breaker.record_failure()
+            raise
+        redis_breaker.record_success()
+        return result
+
+    async def _execute(self, pipe: Any) -> List[Any]:
+        """Run a pipeline and report the outcome to the circuit breaker"""
+        try:
+            result = await pipe.execute()
+        except Exception:
+            redis_breaker.record_failure()
+            raise
+        redis_breaker.record_success()
+        return result
+
     async def get_cached_data(self, key: str) -> dict:
-        """Get data from Redis cache"""
-        if not self.redis_client:
+        """Get data from Redis cache, fresh or stale"""
+        data, _ = await self.get_cached_entry(key)
+        return data
+
+    async def get_cached_entry(self, key: str) -> Tuple[Optional[Any], bool]:
+        """Get data from Redis cache along with whether it is past its soft TTL"""
+        envelope = await self._get_envelope(key)
+        if envelope is None:
+            return None, False
+        return envelope["data"], time.time() >= envelope["stale_at"]
+
+    async def _get_envelope(self, key: str) -> Optional[Dict]:
+        """Cached payload with its metadata, from the local tier or Redis"""
+        envelope = local_cache.get(key)
+        if envelope is not None:
+            return envelope
+
+        if not self._available():
             return None
 
         try:
-            data = self.redis_client.get(key)
-            if data:
-                return json.loads(data)
+            # Taken before the GET, so an invalidation racing the read is noticed
+            read_at = local_cache.sequence()
+            data = await self._call("get", key)
+            if not data:
+                await self._forget(key)
+                return None
+
+            await self._touch(key)
+
+            # Decompressing and parsing a multi-MB payload would block the event loop
+            if len(data) >= settings.CACHE_DECODE_THREAD_MIN_BYTES:
+                envelope = await asyncio.to_thread(cache_codec.decode, data)
+            else:
+                envelope = cache_codec.decode(data)
+            if envelope is None:
+                # Written by an older release in another format, refetch it
+                logging.info(f"Skipping {key} stored in an unknown cache format")
+                return None
+
+            _, _, raw_size = cache_codec.read_header(data)
+            local_cache.set(key, envelope, raw_size, envelope["expires_at"], read_at, envelope.get("version"))
+            return envelope
+        except Exception as e:
+            logging.error(f"Redis get error: {str(e)}")
+            return None
+
+    async def get_version(self, key: str, fetch_fn: Callable[[], Awaitable[Any]],
+                          soft_expiry_minutes: int, hard_expiry_minutes: int) -> Optional[str]:
+        """Content hash of the cached data, None on a miss.
+
+        Like get_or_fetch, a stale entry still counts and is refreshed in
+        the background.
+        """
+        envelope = await self._get_envelope(key)
+        if envelope is None or not envelope["data"]:
+            return None
+        if time.time() >= envelope["stale_at"]:
+            self.refresh_in_background(key, fetch_fn, soft_expiry_minutes, hard_expiry_minutes)
+        return envelope.get("version")
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """Read a raw bytes entry written by set_bytes"""
+        body = local_cache.get(key)
+        if body is not None:
+            return body
+
+        if not self._available():
             return None
+
+        try:
+            read_at = local_cache.sequence()
+            body = await self._call("get", key)
+            if not body:
+                await self._forget(key)
+                return None
+            await self._touch(key)
+            local_cache.set(key, body, len(body), time.time() + settings.LOCAL_CACHE_TTL_SECONDS, read_at)
+            return body
         except Exception as e:
             logging.error(f"Redis get error: {str(e)}")
             return None
 
-    async def set_cached_data(self, key: str, data: dict, expiry_minutes: int) -> bool:
-        """Set data in Redis cache with expiry"""
-        if not self.redis_client:
+    async def set_bytes(self, key: str, body: bytes, expiry_minutes: int) -> bool:
+        """Store bytes as is; keys must be unique per content, they are never invalidated"""
+        if not self._available():
+            return False
+
+        try:
+            fingerprint = tenant_of_key(key)
+            max_bytes = tenant_max_bytes(fingerprint) if fingerprint else 0
+            if max_bytes and len(body) > max_bytes:
+                return False
+
+            read_at = local_cache.sequence()
+            await self._call("setex", key, expiry_minutes * 60, body)
+            if fingerprint:
+                await self._record_write(key, fingerprint, len(body), max_bytes)
+            local_cache.set(key, body, len(body), time.time() + expiry_minutes * 60, read_at)
+            return True
+        except Exception as e:
+            logging.error(f"Redis set error: {str(e)}")
+            return False
+
+    async def set_cached_data(self, key: str, data: dict, expiry_minutes: int,
+                              soft_expiry_minutes: Optional[int] = None) -> bool:
+        """Set data in Redis cache with a hard expiry and optional soft expiry"""
+        if not self._available():
             return False
 
         try:
-            json_data = json.dumps(data)
-            self.redis_client.setex(
+            soft_minutes = soft_expiry_minutes if soft_expiry_minutes is not None else expiry_minutes
+            now = time.time()
+            stale_at = now + soft_minutes * 60
+            expires_at = now + expiry_minutes * 60
+            envelope = {
+                "stale_at": stale_at,
+                "expires_at": expires_at,
+                "version": None,
+                "data": data
+            }
+
+            def encode() -> bytes:
+                # Identical data gets the same version, so refreshes keep derived entries valid
+                envelope["version"] = data_version(data)
+                return cache_codec.encode(envelope)
+
+            # Hashing, serializing and compressing the whole data set would block the event loop
+            blob = await asyncio.to_thread(encode)
+
+            fingerprint = tenant_of_key(key)
+            max_bytes = tenant_max_bytes(fingerprint) if fingerprint else 0
+            if max_bytes and len(blob) > max_bytes:
+                logging.warning(f"Not caching {key}: {len(blob)} bytes exceeds the tenant quota")
+                return False
+
+            read_at = local_cache.sequence()
+            await self._call(
+                "setex",
                 key,
                 expiry_minutes * 60,  # Convert minutes to seconds
-                json_data
+                blob
             )
+            if fingerprint:
+                await self._record_write(key, fingerprint, len(blob), max_bytes)
+
+            _, _, raw_size = cache_codec.read_header(blob)
+            local_cache.set(key, envelope, raw_size, expires_at, read_at, envelope["version"])
+            await self._publish_invalidation(key, envelope["version"])
             return True
         except Exception as e:
             logging.error(f"Redis set error: {str(e)}")
             return False
+
+    async def _record_write(self, key: str, fingerprint: str, size: int, max_bytes: int) -> None:
+        """Account a tenant entry's size and evict LRU entries over the quotas"""
+        evicted = await self._call(
+            "eval", _RECORD_WRITE_SCRIPT, 5, *_ACCOUNTING_KEYS, _tenant_lru_key(fingerprint),
+            key, fingerprint, size, time.time(), max_bytes, settings.CACHE_MAX_BYTES
+        )
+        if evicted:
+            logging.info(f"Evicted {len(evicted)} cache entries to make room for {key}")
+            evicted_keys = [item.decode() for item in evicted]
+            # Entries live in their own tenant's slots, outside the script's keys
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for evicted_key in evicted_keys:
+                    pipe.delete(evicted_key)
+                    pipe.zrem(_tenant_lru_key(tenant_of_key(evicted_key)), evicted_key)
+                await self._execute(pipe)
+            for evicted_key in evicted_keys:
+                local_cache.invalidate(evicted_key)
+                await self._publish_invalidation(evicted_key)
+
+    async def _publish_invalidation(self, key: str, version: Optional[str] = None) -> None:
+        """Tell other workers to drop their local copy of key, unless it already has version"""
+        if settings.LOCAL_CACHE_MAX_BYTES > 0:
+            message = f"{WORKER_ID} {key} {version}" if version else f"{WORKER_ID} {key}"
+            await self._call("publish", settings.CACHE_INVALIDATION_CHANNEL, message)
+
+    async def _touch(self, key: str) -> None:
+        """Mark a tenant entry as recently used"""
+        fingerprint = tenant_of_key(key)
+        if fingerprint:
+            await self._call(
+                "eval", _TOUCH_SCRIPT, 3, CACHE_SIZES_KEY, CACHE_LRU_KEY, _tenant_lru_key(fingerprint),
+                key, time.time()
+            )
+
+    async def _forget(self, key: str) -> None:
+        """Remove accounting for a tenant entry that is gone"""
+        fingerprint = tenant_of_key(key)
+        if fingerprint:
+            await self._call(
+                "eval", _FORGET_SCRIPT, 5, *_ACCOUNTING_KEYS, _tenant_lru_key(fingerprint), key, fingerprint
+            )
+
+    async def run_script(self, script: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """Run a Lua script, None when Redis is unavailable or the script fails"""
+        if not self._available():
+            return None
+
+        try:
+            return await self._call("eval", script, len(keys), *keys, *args)
+        except Exception as e:
+            logging.error(f"Redis script error: {str(e)}")
+            return None
+
+    async def set_list(self, key: str, items: List[Any], expiry_minutes: int,
+                       batch_size: int = 1000) -> bool:
+        """Store items as a Redis list, one JSON document per element.
+
+        The list is replaced in one MULTI/EXEC transaction, so a failure or
+        cancellation part way never leaves a partial list without a TTL.
+        Tenant lists count against the quotas like any other entry.
+        """
+        if not self._available():
+            return False
+
+        try:
+            documents = [dumps(item) for item in items]
+            size = sum(len(document) for document in documents)
+
+            fingerprint = tenant_of_key(key)
+            max_bytes = tenant_max_bytes(fingerprint) if fingerprint else 0
+            if max_bytes and size > max_bytes:
+                logging.warning(f"Not caching {key}: {size} bytes exceeds the tenant quota")
+                return False
+
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                for start in range(0, len(documents), batch_size):
+                    pipe.rpush(key, *documents[start:start + batch_size])
+                pipe.expire(key, expiry_minutes * 60)
+                await self._execute(pipe)
+            if fingerprint:
+                await self._record_write(key, fingerprint, size, max_bytes)
+            return True
+        except Exception as e:
+            logging.error(f"Redis list set error: {str(e)}")
+            return False
+
+    async def get_list_range(self, key: str, start: int, count: int) -> Optional[Tuple[List[Any], int]]:
+        """Read count items from a Redis list along with its length, None if missing"""
+        if not self._available():
+            return None
+
+        try:
+            total = await self._call("llen", key)
+            if not total:
+                await self._forget(key)
+                return None
+            await self._touch(key)
+            items = await self._call("lrange", key, start, start + count - 1)
+            return [loads(item) for item in items], total
+        except Exception as e:
+            logging.error(f"Redis list get error: {str(e)}")
+            return None
+
+    async def get_or_fetch(self, key: str, fetch_fn: Callable[[], Awaitable[Any]],
+                           soft_expiry_minutes: int, hard_expiry_minutes: int) -> Any:
+        """Stale-while-revalidate read.
+
+        Fresh entries are returned as is. Entries past the soft TTL are
+        returned at once while a background task refreshes them. Only a
+        miss (nothing cached, or past the hard TTL) blocks on fetch_fn.
+        """
+        cached_data, is_stale = await self.get_cached_entry(key)
+        if cached_data:
+            if is_stale:
+                logging.info(f"Serving stale data for {key}, refreshing in background")
+                self.refresh_in_background(key, fetch_fn, soft_expiry_minutes, hard_expiry_minutes)
+            else:
+                logging.info(f"Using cached data for {key}")
+            return cached_data
+
+        return await self.single_flight(key, fetch_fn, hard_expiry_minutes, soft_expiry_minutes)
+
+    async def get_or_fetch_versioned(self, key: str, fetch_fn: Callable[[], Awaitable[Any]],
+                                     soft_expiry_minutes: int, hard_expiry_minutes: int) -> Tuple[Any, Optional[str]]:
+        """get_or_fetch that also returns the version of exactly the data it returns.
+
+        Both come from the same envelope, so a refresh landing in between
+        cannot pair old data with a newer version. After a miss the version
+        is computed from the fetched data, which matches the stored one.
+        """
+        envelope = await self._get_envelope(key)
+        if envelope is not None and envelope["data"]:
+            if time.time() >= envelope["stale_at"]:
+                logging.info(f"Serving stale data for {key}, refreshing in background")
+                self.refresh_in_background(key, fetch_fn, soft_expiry_minutes, hard_expiry_minutes)
+            return envelope["data"], envelope.get("version")
+
+        data = await self.single_flight(key, fetch_fn, hard_expiry_minutes, soft_expiry_minutes)
+        if not data:
+            return data, None
+        return data, await asyncio.to_thread(data_version, data)
+
+    def refresh_in_background(self, key: str, fetch_fn: Callable[[], Awaitable[Any]],
+                              soft_expiry_minutes: int, hard_expiry_minutes: int) -> None:
+        """Schedule a refresh unless one is already running in this worker"""
+        if key in _inflight:
+            return
+
+        task = asyncio.create_task(
+            self._refresh(key, fetch_fn, soft_expiry_minutes, hard_expiry_minutes)
+        )
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def refresh_ahead(self, key: str, fetch_fn: Callable[[], Awaitable[Any]],
+                            soft_expiry_minutes: int, hard_expiry_minutes: int,
+                            refresh_within: float) -> Optional[float]:
+        """Refresh an entry that is missing or goes stale within refresh_within seconds.
+
+        Returns the seconds left until the entry is stale, None when nothing is cached.
+        """
+        if key not in _inflight:
+            envelope = await self._get_envelope(key)
+            if envelope is None or envelope["stale_at"] - time.time() <= refresh_within:
+                await self._refresh(key, fetch_fn, soft_expiry_minutes, hard_expiry_minutes, refresh_within)
+
+        envelope = await self._get_envelope(key)
+        if envelope is None or not envelope["data"]:
+            return None
+        return envelope["stale_at"] - time.time()
+
+    async def _refresh(self, key: str, fetch_fn: Callable[[], Awaitable[Any]],
+                       soft_expiry_minutes: int, hard_expiry_minutes: int,
+                       refresh_within: float = 0) -> None:
+        """Refresh a stale entry if no other worker is already doing so"""
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        _inflight[key] = future
+
+        try:
+            if not await self._acquire_lock(lock_key, token):
+                logging.info(f"Refresh of {key} already running in another worker")
+                cached_data = await self.get_cached_data(key)
+                if not cached_data:
+                    # Nothing left to hand out (e.g. past the hard TTL): wait for the holder
+                    cached_data = await self._fetch_with_lock(key, fetch_fn, hard_expiry_minutes, soft_expiry_minutes)
+                future.set_result(cached_data)
+                return
+
+            keep_alive = asyncio.create_task(self._keep_lock_alive(lock_key, token))
+            try:
+                # Another worker may have refreshed it while we took the lock
+                envelope = await self._get_envelope(key)
+                if envelope and envelope["data"] and envelope["stale_at"] - time.time() > refresh_within:
+                    future.set_result(envelope["data"])
+                    return
+
+                result = await fetch_fn()
+                if result:
+                    await self.set_cached_data(key, result, hard_expiry_minutes, soft_expiry_minutes)
+                future.set_result(result)
+                logging.info(f"Background refresh of {key} completed")
+            finally:
+                keep_alive.cancel()
+                await self._release_lock(lock_key, token)
+        except Exception as e:
+            logging.error(f"Background refresh of {key} failed: {str(e)}", exc_info=True)
+            if not future.done():
+                future.set_exception(e)
+                future.exception()
+        finally:
+            if not future.done():
+                future.cancel()
+            _inflight.pop(key, None)
+
+    async def single_flight(self, key: str, fetch_fn: Callable[[], Awaitable[Any]],
+                            expiry_minutes: int, soft_expiry_minutes: Optional[int] = None) -> Any:
+        """Run fetch_fn once per key across workers and cache its result.
+
+        Callers in this worker share the leader's future; callers in other
+        workers wait on a Redis lock and pick the result up from the cache.
+        """
+        inflight = _inflight.get(key)
+        if inflight is not None:
+            logging.info(f"Joining in-flight fetch for {key}")
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        _inflight[key] = future
+        try:
+            result = await self._fetch_with_lock(key, fetch_fn, expiry_minutes, soft_expiry_minutes)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            _inflight.pop(key, None)
+
+    async def _fetch_with_lock(self, key: str, fetch_fn: Callable[[], Awaitable[Any]],
+                               expiry_minutes: int, soft_expiry_minutes: Optional[int]) -> Any:
+        """Fetch as lock holder, or wait for the holder to fill the cache"""
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SINGLE_FLIGHT_WAIT_SECONDS
+
+        while True:
+            if await self._acquire_lock(lock_key, token):
+                keep_alive = asyncio.create_task(self._keep_lock_alive(lock_key, token))
+                try:
+                    # Another worker may have filled the cache while we waited
+                    cached_data = await self.get_cached_data(key)
+                    if cached_data:
+                        return cached_data
+
+                    result = await fetch_fn()
+                    if result:
+                        await self.set_cached_data(key, result, expiry_minutes, soft_expiry_minutes)
+                    return result
+                finally:
+                    keep_alive.cancel()
+                    await self._release_lock(lock_key, token)
+
+            await asyncio.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+
+            cached_data = await self.get_cached_data(key)
+            if cached_data:
+                logging.info(f"Using result of concurrent fetch for {key}")
+                return cached_data
+
+            if loop.time() >= deadline:
+                logging.warning(f"Timed out waiting for concurrent fetch of {key}, fetching directly")
+                return await fetch_fn()
+
+    async def _acquire_lock(self, lock_key: str, token: str) -> bool:
+        """Try to take the lock; without Redis every caller is its own leader"""
+        if not self._available():
+            return True
+
+        try:
+            return bool(await self._call(
+                "set", lock_key, token, nx=True, ex=settings.SINGLE_FLIGHT_LOCK_SECONDS
+            ))
+        except Exception as e:
+            logging.error(f"Redis lock error: {str(e)}")
+            return True
+
+    async def _release_lock(self, lock_key: str, token: str) -> None:
+        if not self._available():
+            return
+
+        try:
+            await self._call("eval", _RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logging.error(f"Redis unlock error: {str(e)}")
+
+    async def _keep_lock_alive(self, lock_key: str, token: str) -> None:
+        """Extend the lock while the fetch is still running"""
+        if not self.redis_client:
+            return
+
+        ttl_ms = settings.SINGLE_FLIGHT_LOCK_SECONDS * 1000
+        while True:
+            await asyncio.sleep(settings.SINGLE_FLIGHT_LOCK_SECONDS / 3)
+            if not self._available():
+                continue
+            try:
+                if not await self._call("eval", _EXTEND_LOCK_SCRIPT, 1, lock_key, token, ttl_ms):
+                    logging.warning(f"Lost single-flight lock {lock_key}")
+                    return
+            except Exception as e:
+                logging.error(f"Redis lock refresh error: {str(e)}")
@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+from typing import Any, Optional, Set
+from fastapi.responses import Response
+from ..config import settings
+from .redis_cache import RedisCache
+from .serialization import dumps
+
+# Encodings we pre-compress full responses with, in order of preference
+GZIP_ENCODING = "gzip"
+BROTLI_ENCODING = "br"
+IDENTITY_ENCODING = "identity"
+
+
+def _brotli_module():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Set[str]:
+    """Encodings listed in Accept-Encoding, without the q=0 (refused) ones"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        params = params.strip().lower()
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    return encoding in _accepted_encodings(accept_encoding)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """Pick the best encoding the client accepts"""
+    accepted = _accepted_encodings(accept_encoding)
+    if BROTLI_ENCODING in accepted and _brotli_module():
+        return BROTLI_ENCODING
+    if GZIP_ENCODING in accepted:
+        return GZIP_ENCODING
+    return IDENTITY_ENCODING
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == BROTLI_ENCODING:
+        return _brotli_module().compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    if encoding == GZIP_ENCODING:
+        return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+    return body
+
+
+def body_etag(body: bytes) -> str:
+    """Weak ETag of an uncompressed body; weak because middleware may still re-encode it"""
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check, using the weak comparison the header calls for"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+
+class ResponseBodyCache:
+    """Serialized and compressed full responses, stored next to their data.
+
+    Bodies are keyed by the content version of the cached data they were
+    built from plus the variant (format, timezone, ...) and encoding, so a
+    cache hit is answered with stored bytes: no serialization and no
+    compression. Pre-compressed responses carry Content-Encoding, which
+    makes GZipMiddleware pass them through untouched. The data version also
+    yields a strong ETag, so conditional requests can be answered before
+    any of this.
+    """
+
+    def __init__(self, data_key: str, variant: str, accept_encoding: Optional[str], expiry_minutes: int):
+        self.data_key = data_key
+        self.variant = variant
+        self.encoding = choose_encoding(accept_encoding)
+        self.expiry_minutes = expiry_minutes
+        self.cache = RedisCache()
+
+    def _key(self, version: str) -> str:
+        return f"{self.data_key}:body:{version}:{self.variant}:{self.encoding}"
+
+    def etag(self, version: str) -> str:
+        """Strong ETag of this representation (data version, variant and encoding)"""
+        tag = hashlib.blake2b(f"{version}:{self.variant}:{self.encoding}".encode(), digest_size=16)
+        return f'"{tag.hexdigest()}"'
+
+    def _response(self, body: bytes, etag: str) -> Response:
+        headers = {"Vary": "Accept-Encoding", "ETag": etag}
+        if self.encoding != IDENTITY_ENCODING:
+            headers["Content-Encoding"] = self.encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def get(self, version: Optional[str]) -> Optional[Response]:
+        """Stored response for this version of the data, if any"""
+        if not version or self.encoding == IDENTITY_ENCODING:
+            return None
+
+        body = await self.cache.get_bytes(self._key(version))
+        if body is None:
+            return None
+        logging.info(f"Serving stored {self.encoding} response for {self.data_key}")
+        return self._response(body, self.etag(version))
+
+    async def build(self, version: Optional[str], payload: Any) -> Response:
+        """Serialize and compress payload, storing the result when the data is cached.
+
+        version must be the version payload was built from (as returned with
+        the data), not a fresh read: the stored body is served for that
+        version until the data changes.
+        """
+        body = dumps(payload)
+        etag = self.etag(version) if version else body_etag(body)
+        if self.encoding == IDENTITY_ENCODING:
+            return self._response(body, etag)
+
+        # Compressing multi-MB bodies would block the event loop
+        body = await asyncio.to_thread(compress_body, body, self.encoding)
+        if version:
+            await self.cache.set_bytes(self._key(version), body, self.expiry_minutes)
+        return self._response(body, etag)
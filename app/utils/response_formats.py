@@ -0,0 +1,122 @@
+import logging
+from typing import AsyncIterator, Dict, List
+from fastapi.responses import StreamingResponse
+from .serialization import dumps, dumps_line
+
+# Output formats accepted by the list endpoints through ?format=
+JSON_FORMAT = "json"
+NDJSON_FORMAT = "ndjson"
+JSON_STREAM_FORMAT = "json-stream"
+TABLE_FORMAT = "table"
+STREAMING_FORMATS = (NDJSON_FORMAT, JSON_STREAM_FORMAT)
+FORMAT_PATTERN = f"^({JSON_FORMAT}|{NDJSON_FORMAT}|{JSON_STREAM_FORMAT}|{TABLE_FORMAT})$"
+
+# List-valued fields spread over one column per element in the table format
+FLATTENED_COLUMNS = {
+    'project_names': [f'project_name_{i}' for i in range(1, 8)],
+}
+
+# List-valued fields of any length, joined into a single column in the table format
+JOINED_COLUMNS = {
+    'deeper_project_names': ' > ',
+}
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def to_table(rows: List[Dict]) -> Dict:
+    """Convert formatted rows into a header row plus a value matrix.
+
+    Column order follows the keys of the prepare_* output; list fields
+    listed in FLATTENED_COLUMNS are spread over fixed columns, those in
+    JOINED_COLUMNS are joined into one.
+    """
+    if not rows:
+        return {"columns": [], "rows": []}
+
+    keys = list(rows[0].keys())
+    columns = []
+    for key in keys:
+        columns.extend(FLATTENED_COLUMNS.get(key, [key]))
+
+    if not any(key in FLATTENED_COLUMNS or key in JOINED_COLUMNS for key in keys):
+        return {"columns": columns, "rows": [[row.get(key) for key in keys] for row in rows]}
+
+    values = []
+    for row in rows:
+        row_values = []
+        for key in keys:
+            value = row.get(key)
+            if key in FLATTENED_COLUMNS:
+                width = len(FLATTENED_COLUMNS[key])
+                items = list(value or [])[:width]
+                row_values.extend(items + [''] * (width - len(items)))
+            elif key in JOINED_COLUMNS:
+                row_values.append(JOINED_COLUMNS[key].join(value or []))
+            else:
+                row_values.append(value)
+        values.append(row_values)
+    return {"columns": columns, "rows": values}
+
+
+def format_page(page: Dict, output_format: str) -> Dict:
+    """Apply the table format to a paginated response"""
+    if output_format != TABLE_FORMAT:
+        return page
+    return {**to_table(page["data"]), "total": page["total"], "next_page_token": page["next_page_token"]}
+
+
+async def iter_batches(rows: List[Dict], batch_size: int = 1000) -> AsyncIterator[List[Dict]]:
+    """Turn an already materialized result into row batches"""
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+async def _chain(first_batch: List[Dict], batches: AsyncIterator[List[Dict]]) -> AsyncIterator[List[Dict]]:
+    yield first_batch
+    async for batch in batches:
+        yield batch
+
+
+async def _ndjson_body(first_batch: List[Dict], batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    """One JSON document per line, flushed per batch"""
+    try:
+        async for batch in _chain(first_batch, batches):
+            if batch:
+                yield b"".join(dumps_line(row) for row in batch)
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band as the last line
+        logging.exception("Error while streaming NDJSON response")
+        yield dumps_line({"error": str(e)})
+
+
+async def _json_array_body(first_batch: List[Dict], batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    """A regular JSON array, sent in chunks as batches arrive"""
+    yield b"["
+    first = True
+    try:
+        async for batch in _chain(first_batch, batches):
+            if not batch:
+                continue
+            chunk = b",".join(dumps(row) for row in batch)
+            yield chunk if first else b"," + chunk
+            first = False
+    except Exception:
+        # Leave the array unterminated so clients see a parse error, not a short result
+        logging.exception("Error while streaming JSON array response")
+        return
+    yield b"]"
+
+
+async def streaming_response(output_format: str, batches: AsyncIterator[List[Dict]]) -> StreamingResponse:
+    """Build a streaming response from row batches.
+
+    The first batch is awaited before the response starts, so errors that
+    happen before any data arrives (bad API key, upstream down) still
+    surface as regular HTTP errors.
+    """
+    first_batch = await anext(batches, [])
+
+    if output_format == NDJSON_FORMAT:
+        return StreamingResponse(_ndjson_body(first_batch, batches), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(_json_array_body(first_batch, batches), media_type="application/json")
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import httpx
+from ..config import settings
+from .rate_limiter import upstream_rate_limiter
+
+# Statuses worth another attempt; other errors would fail the same way again
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+# Statuses whose Retry-After header tells us how long to wait
+RETRY_AFTER_STATUS_CODES = {429, 503}
+
+
+class RetryBudget:
+    """Retries shared by every upstream call made on behalf of one API request.
+
+    Per-call attempts alone would let a request that pages through hundreds
+    of chunks retry hundreds of times against an upstream that is down.
+    """
+
+    def __init__(self, retries: Optional[int] = None):
+        self.remaining = settings.UPSTREAM_RETRY_BUDGET if retries is None else retries
+
+    def take(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Seconds from a Retry-After header (delay or HTTP date), None if absent or invalid"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry (0-based)"""
+    ceiling = min(settings.UPSTREAM_RETRY_MAX_SECONDS, settings.UPSTREAM_RETRY_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+async def post_with_retry(client: httpx.AsyncClient, url: str, budget: Optional[RetryBudget] = None,
+                          **kwargs) -> httpx.Response:
+    """POST an idempotent GraphQL read, retrying transient failures.
+
+    Connection errors, timeouts and 429/502/503/504 responses are retried
+    up to UPSTREAM_RETRY_ATTEMPTS times while the budget lasts, waiting as
+    Retry-After says on 429/503 and with jittered exponential backoff
+    otherwise. Callers page with cursors, so a retried page resumes the
+    crawl where it failed. Once retries run out the last response is
+    returned (or the last error raised) for the caller's usual handling.
+    Attempts are paced by the tenant's upstream rate limit.
+    """
+    budget = budget or RetryBudget()
+    api_key = (kwargs.get("headers") or {}).get("key-authorization")
+    attempt = 0
+    while True:
+        error = None
+        delay = None
+        # Every attempt, retries included, counts against the tenant's upstream rate
+        await upstream_rate_limiter.acquire(api_key)
+        try:
+            response = await client.post(url, **kwargs)
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            reason = f"HTTP {response.status_code}"
+            if response.status_code in RETRY_AFTER_STATUS_CODES:
+                delay = retry_after_seconds(response)
+        except httpx.TransportError as e:
+            error = e
+            reason = f"{type(e).__name__}: {str(e)}"
+
+        attempt += 1
+        if attempt >= settings.UPSTREAM_RETRY_ATTEMPTS or not budget.take():
+            logging.error(f"Upstream request failed after {attempt} attempts ({reason})")
+            if error is not None:
+                raise error
+            return response
+
+        if delay is None:
+            delay = backoff_seconds(attempt - 1)
+        delay = min(delay, settings.UPSTREAM_RETRY_MAX_SECONDS)
+        logging.warning(
+            f"Upstream request failed ({reason}), retrying in {delay:.1f}s "
+            f"(attempt {attempt + 1} of {settings.UPSTREAM_RETRY_ATTEMPTS}, {budget.remaining} retries left)"
+        )
+        await asyncio.sleep(delay)
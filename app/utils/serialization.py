@@ -0,0 +1,19 @@
+import orjson
+from typing import Any, Union
+
+# Single JSON layer for API responses, upstream GraphQL bodies and cache payloads
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    return orjson.dumps(data)
+
+
+def dumps_line(data: Any) -> bytes:
+    """Serialize to JSON bytes followed by a newline (one NDJSON record)"""
+    return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parse JSON from bytes or str"""
+    return orjson.loads(data)
@@ -0,0 +1,67 @@
+import hashlib
+import hmac
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Tuple
+from ..config import settings
+
+# Cache entries are namespaced per tenant as tenant:{fingerprint}:{name}, where
+# the fingerprint is a salted HMAC of the API key (the key itself never reaches Redis)
+TENANT_PREFIX = "tenant:"
+
+_warned_missing_salt = False
+
+
+@lru_cache(maxsize=1024)
+def tenant_fingerprint(api_key: str) -> str:
+    """Stable, non-reversible identifier of the tenant behind an API key"""
+    global _warned_missing_salt
+    if not settings.CACHE_KEY_SALT and not _warned_missing_salt:
+        logging.warning("CACHE_KEY_SALT is not set, tenant cache keys use an unsalted hash")
+        _warned_missing_salt = True
+    return hmac.new(settings.CACHE_KEY_SALT.encode(), api_key.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def tenant_cache_key(api_key: str, name: str) -> str:
+    """Cache key for name in the API key's tenant namespace"""
+    return f"{TENANT_PREFIX}{tenant_fingerprint(api_key)}:{name}"
+
+
+def tenant_of_key(key: str) -> str:
+    """Fingerprint part of a tenant cache key, empty for shared keys"""
+    if not key.startswith(TENANT_PREFIX):
+        return ""
+    return key[len(TENANT_PREFIX):].split(":", 1)[0]
+
+
+@lru_cache(maxsize=1)
+def _overrides(raw: str) -> Dict[str, Dict]:
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        logging.error(f"Invalid TENANT_CACHE_OVERRIDES: {str(e)}")
+        return {}
+
+
+def tenant_settings(fingerprint: str) -> Dict:
+    """Per-tenant overrides from TENANT_CACHE_OVERRIDES, keyed by fingerprint"""
+    return _overrides(settings.TENANT_CACHE_OVERRIDES).get(fingerprint, {})
+
+
+def tenant_ttl_minutes(api_key: str, is_archived: bool) -> Tuple[int, int]:
+    """Soft and hard cache TTLs in minutes for this tenant's active or archived data"""
+    overrides = tenant_settings(tenant_fingerprint(api_key))
+    if is_archived:
+        return (overrides.get("archive_soft_minutes", settings.ARCHIVE_CACHE_SOFT_MINUTES),
+                overrides.get("archive_hard_minutes", settings.ARCHIVE_CACHE_HARD_MINUTES))
+    return (overrides.get("active_soft_minutes", settings.ACTIVE_CACHE_SOFT_MINUTES),
+            overrides.get("active_hard_minutes", settings.ACTIVE_CACHE_HARD_MINUTES))
+
+
+def tenant_max_bytes(fingerprint: str) -> int:
+    """Byte quota of a tenant's cache entries, 0 for no limit"""
+    return tenant_settings(fingerprint).get("max_bytes", settings.TENANT_CACHE_MAX_BYTES)
+
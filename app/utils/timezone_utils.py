@@ -76,3 +76,19 @@ def convert_utc_to_timezone(dt: str, timezone_str: str) -> str:
     except Exception as e:
         logging.error(f"Error converting timezone for '{dt}' with '{timezone_str}': {str(e)}")
         return ''
+
+def format_timestamp(dt: str, timezone_str: str = None) -> str:
+    """Convert a UTC timestamp to timezone_str, or keep it in UTC when no timezone is given"""
+    if timezone_str is None:
+        return dt or ''
+    return convert_utc_to_timezone(dt, timezone_str)
+
+def convert_rows_to_timezone(rows: list, timezone_str: str, fields: tuple = ('created_on', 'updated_on')) -> list:
+    """Copy formatted rows holding UTC timestamps with those fields converted to timezone_str"""
+    converted_rows = []
+    for row in rows:
+        row_copy = row.copy()
+        for field in fields:
+            row_copy[field] = convert_utc_to_timezone(row[field], timezone_str)
+        converted_rows.append(row_copy)
+    return converted_rows
@@ -0,0 +1,51 @@
+import asyncio
+import itertools
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Tuple
+
+
+class WorkScheduler:
+    """Run prioritized jobs on a fixed number of workers, yielding results as they finish.
+
+    Jobs start in priority order (lowest first) and at most `workers` run at
+    once, so open sockets and pages in flight stay bounded however many jobs
+    there are. Finished results are handed over through a queue of the same
+    size, so workers also pause while the consumer is behind. The first
+    failure, or the consumer stopping early, cancels all remaining work.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(workers, 1)
+        self._jobs: List[Tuple[Any, int, Any, Callable[[], Awaitable[Any]]]] = []
+        self._order = itertools.count()
+
+    def add(self, priority: Any, key: Any, job: Callable[[], Awaitable[Any]]) -> None:
+        """Queue job(); its result is yielded together with key"""
+        self._jobs.append((priority, next(self._order), key, job))
+
+    async def results(self) -> AsyncIterator[Tuple[Any, Any]]:
+        pending: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        for job in self._jobs:
+            pending.put_nowait(job)
+        finished: asyncio.Queue = asyncio.Queue(maxsize=self.workers)
+
+        async def work() -> None:
+            while not pending.empty():
+                _, _, key, job = pending.get_nowait()
+                try:
+                    result = await job()
+                except Exception as e:
+                    await finished.put((key, e, True))
+                    return
+                await finished.put((key, result, False))
+
+        tasks = [asyncio.create_task(work()) for _ in range(min(self.workers, len(self._jobs)))]
+        try:
+            for _ in range(len(self._jobs)):
+                key, result, failed = await finished.get()
+                if failed:
+                    raise result
+                yield key, result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
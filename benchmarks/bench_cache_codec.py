@@ -0,0 +1,52 @@
+"""Compare cache payload codecs on a large project export.
+
+Usage:
+    python -m benchmarks.bench_cache_codec
+    python -m benchmarks.bench_cache_codec --rows 50000 --repeat 5
+
+Reports the stored size, compression ratio and encode/decode time of
+every serializer/compression pair available in this environment, next to
+the plain JSON text the cache stored before payloads were compressed.
+"""
+import argparse
+import json
+from typing import Dict, List
+
+from app.config import settings
+from app.utils import cache_codec
+
+from .bench_serialization import _best_of, formatted_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    envelope: Dict = {"stale_at": 0.0, "expires_at": 0.0, "data": formatted_rows(args.rows)}
+    plain = json.dumps(envelope).encode()
+    plain_decode = _best_of(lambda: json.loads(plain), args.repeat)
+
+    print(f"{args.rows} project rows, plain JSON {len(plain) / 1e6:.1f} MB, decode {plain_decode * 1000:.1f} ms")
+    print(f"{'codec':<16} {'size (MB)':>10} {'ratio':>7} {'encode (ms)':>12} {'decode (ms)':>12}")
+
+    results: List = []
+    for serializer in cache_codec.SERIALIZERS:
+        for compression in cache_codec.COMPRESSIONS:
+            settings.CACHE_SERIALIZER, settings.CACHE_COMPRESSION = serializer, compression
+            codec = cache_codec.CacheCodec()
+            if (codec.serializer, codec.compression) != (serializer, compression):
+                continue  # Package not installed
+
+            blob = codec.encode(envelope)
+            encode = _best_of(lambda: codec.encode(envelope), args.repeat)
+            decode = _best_of(lambda: codec.decode(blob), args.repeat)
+            results.append((f"{serializer}+{compression}", len(blob), encode, decode))
+
+    for name, size, encode, decode in results:
+        print(f"{name:<16} {size / 1e6:>10.2f} {len(plain) / size:>6.1f}x {encode * 1000:>12.1f} {decode * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
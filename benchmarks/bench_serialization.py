@@ -0,0 +1,138 @@
+"""Compare stdlib json with the orjson layer on a large project export.
+
+Usage:
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --rows 50000 --repeat 5
+
+Measures the three places the API serializes JSON: decoding upstream
+GraphQL pages, encoding the response (FastAPI's default path is
+jsonable_encoder followed by json.dumps) and the cache round trip.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from app.utils import serialization
+
+
+def generate_upstream_page(rows: int, seed: int = 42) -> Dict:
+    """A GraphQL projects response with one nested child per root"""
+    rng = random.Random(seed)
+
+    def project(i: int, depth: int) -> Dict:
+        return {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "title": f"Project {i} {'x' * rng.randint(5, 30)}",
+            "archivedOn": None,
+            "depth": depth,
+            "createdOn": "2024-01-01T08:30:00",
+            "updatedOn": "2024-06-01T17:45:12",
+            "projectInfo": {
+                "projectId": f"{i}",
+                "number": f"P-{i:06d}",
+                "customer": f"Customer {rng.randint(1, 500)}",
+                "address1": f"{rng.randint(1, 9999)} Main Street",
+                "address2": "",
+                "city": "Springfield",
+                "state": "UT",
+                "postalCode": f"{rng.randint(10000, 99999)}",
+                "phone": f"555{rng.randint(1000000, 9999999)}",
+                "reminder": rng.random() > 0.5,
+                "requireTimeEntryGps": rng.choice(["self", "self_and_children", None]),
+                "additionalInfo": "",
+                "latitude": rng.uniform(-90, 90),
+                "locationRadius": rng.randint(50, 500),
+                "longitude": rng.uniform(-180, 180),
+            },
+            "projectGroup": {"groupName": f"Group {rng.randint(1, 20)}"},
+        }
+
+    roots = []
+    for i in range(0, rows, 2):
+        root = project(i, 1)
+        root["cursor"] = f"cursor-{i}"
+        root["children"] = [project(i + 1, 2)]
+        roots.append(root)
+    return {"data": {"projects": roots}}
+
+
+def formatted_rows(rows: int, seed: int = 42) -> List[Dict]:
+    """Rows shaped like ProjectService.prepare_hierarchy output"""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "number": f"P-{i:06d}",
+            "customer": f"Customer {rng.randint(1, 500)}",
+            "address1": f"{rng.randint(1, 9999)} Main Street",
+            "address2": "",
+            "city": "Springfield",
+            "state": "UT",
+            "postal_code": f"{rng.randint(10000, 99999)}",
+            "phone": f"555{rng.randint(1000000, 9999999)}",
+            "project_names": [f"Project {i // 2}", f"Project {i}" if i % 2 else "", "", "", "", "", ""],
+            "group_name": f"Group {rng.randint(1, 20)}",
+            "latitude": rng.uniform(-90, 90),
+            "longitude": rng.uniform(-180, 180),
+            "has_reminder": "Yes",
+            "location_radius": rng.randint(50, 500),
+            "additional_info": "",
+            "created_on": "2024-01-01T08:30:00",
+            "updated_on": "2024-06-01T17:45:12",
+            "requires_gps": "No",
+            "requires_gps_children": "No",
+            "status": "Active",
+        }
+        for i in range(rows)
+    ]
+
+
+def _best_of(func: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _stdlib_response(rows: List[Dict]) -> bytes:
+    # What fastapi.responses.JSONResponse does after jsonable_encoder
+    return json.dumps(
+        jsonable_encoder(rows), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    upstream_body = json.dumps(generate_upstream_page(args.rows)).encode()
+    rows = formatted_rows(args.rows)
+    cache_blob = json.dumps(rows)
+
+    cases = [
+        ("upstream decode", lambda: json.loads(upstream_body), lambda: serialization.loads(upstream_body)),
+        ("response encode", lambda: _stdlib_response(rows), lambda: serialization.dumps(rows)),
+        ("cache encode", lambda: json.dumps(rows), lambda: serialization.dumps(rows)),
+        ("cache decode", lambda: json.loads(cache_blob), lambda: serialization.loads(cache_blob)),
+    ]
+
+    print(f"{args.rows} project rows, upstream body {len(upstream_body) / 1e6:.1f} MB, "
+          f"cache blob {len(cache_blob) / 1e6:.1f} MB")
+    print(f"{'step':<18} {'stdlib (ms)':>12} {'orjson (ms)':>12} {'speedup':>9}")
+    for name, stdlib_func, orjson_func in cases:
+        stdlib_seconds = _best_of(stdlib_func, args.repeat)
+        orjson_seconds = _best_of(orjson_func, args.repeat)
+        print(f"{name:<18} {stdlib_seconds * 1000:>12.1f} {orjson_seconds * 1000:>12.1f} "
+              f"{stdlib_seconds / orjson_seconds:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,433 @@
+"""Local stand-in for the BusyBusy GraphQL API.
+
+Usage:
+    python -m benchmarks.fake_graphql --port 8765 --roots 500 --latency-ms 50
+
+Serves a synthetic tenant for the queries this API sends: projects (with
+nested children and ancestors), budgetHours, budgetCosts,
+progressBudgets, costCodes, members and equipment. Root fields may be
+aliased and several can be sent in one document. Filters, sorts and
+cursor pagination are applied to the generated records; selection sets
+are not, every record is returned whole except for children/ancestors.
+
+GET /__stats returns request counts per root field, POST /__reset clears
+them. This is not a GraphQL implementation, only enough of one to drive
+the services end to end.
+"""
+import argparse
+import asyncio
+import random
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+
+class TenantData:
+    """Deterministic synthetic records for one organization"""
+
+    def __init__(self, roots: int = 200, children_per_project: int = 3, max_depth: int = 3,
+                 members: int = 500, cost_codes: int = 200, equipment: int = 300,
+                 budget_cost_codes_per_project: int = 2, archived_ratio: float = 0.1, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.archived_ratio = archived_ratio
+        self.base_time = datetime(2024, 1, 1)
+        self.cost_codes = [self._cost_code(i) for i in range(cost_codes)]
+        self.projects: List[Dict] = []
+        self.projects_by_id: Dict[str, Dict] = {}
+        self.children: Dict[str, List[Dict]] = {}
+        for i in range(roots):
+            self._add_project(f"{i}", None, 1, children_per_project, max_depth)
+        self.members = [self._member(i) for i in range(members)]
+        self.equipment = [self._equipment(i) for i in range(equipment)]
+        self.budget_hours, self.budget_costs, self.progress_budgets = self._budgets(budget_cost_codes_per_project)
+
+    def _timestamp(self, days: int = 0) -> str:
+        return (self.base_time + timedelta(days=days, seconds=self.rng.randint(0, 86400))).strftime('%Y-%m-%dT%H:%M:%S')
+
+    def _maybe_archived(self) -> Optional[str]:
+        return self._timestamp(300) if self.rng.random() < self.archived_ratio else None
+
+    def _add_project(self, path: str, parent: Optional[Dict], depth: int, branching: int, max_depth: int) -> None:
+        project_id = f"proj-{path}"
+        project = {
+            "id": project_id,
+            "title": f"Project {path}",
+            "archivedOn": self._maybe_archived(),
+            "depth": depth,
+            "parentProjectId": parent["id"] if parent else None,
+            "rootProjectId": parent["rootProjectId"] if parent else project_id,
+            "createdOn": self._timestamp(self.rng.randint(0, 100)),
+            "updatedOn": self._timestamp(self.rng.randint(100, 200)),
+            "projectInfo": {
+                "projectId": project_id,
+                "number": f"P-{path}",
+                "customer": f"Customer {self.rng.randint(1, 100)}",
+                "address1": f"{self.rng.randint(1, 9999)} Main Street",
+                "address2": "",
+                "city": "Springfield",
+                "state": "UT",
+                "postalCode": f"{self.rng.randint(10000, 99999)}",
+                "phone": f"+1555{self.rng.randint(1000000, 9999999)}",
+                "reminder": self.rng.random() > 0.5,
+                "requireTimeEntryGps": self.rng.choice(["self", "self_and_children", None]),
+                "additionalInfo": "",
+                "latitude": round(self.rng.uniform(-90, 90), 6),
+                "locationRadius": self.rng.randint(50, 500),
+                "longitude": round(self.rng.uniform(-180, 180), 6),
+            },
+            "projectGroup": {"groupName": f"Group {self.rng.randint(1, 10)}"},
+        }
+        self.projects.append(project)
+        self.projects_by_id[project_id] = project
+        self.children.setdefault(project_id, [])
+        if parent:
+            self.children[parent["id"]].append(project)
+
+        if depth < max_depth:
+            for i in range(self.rng.randint(0, branching)):
+                self._add_project(f"{path}.{i}", project, depth + 1, branching, max_depth)
+
+    def ancestors(self, project: Dict) -> List[Dict]:
+        result = []
+        parent_id = project["parentProjectId"]
+        while parent_id:
+            parent = self.projects_by_id[parent_id]
+            result.append({key: parent[key] for key in ("id", "title", "depth", "archivedOn", "createdOn")})
+            parent_id = parent["parentProjectId"]
+        return result
+
+    def _cost_code(self, i: int) -> Dict:
+        return {
+            "id": f"cc-{i}",
+            "costCode": f"{i:04d}",
+            "title": f"Cost code {i}",
+            "unitTitle": self.rng.choice(["ft", "yd", "ea", None]),
+            "costCodeGroup": {"groupName": f"CC group {i % 7}"},
+            "createdOn": self._timestamp(self.rng.randint(0, 100)),
+            "updatedOn": self._timestamp(self.rng.randint(100, 200)),
+            "archivedOn": self._maybe_archived(),
+        }
+
+    def _member(self, i: int) -> Dict:
+        return {
+            "id": f"member-{i}",
+            "firstName": f"First{i}",
+            "lastName": f"Last{i}",
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "phone": f"+1555{i:07d}",
+            "memberNumber": f"M{i:05d}",
+            "position": {"title": self.rng.choice(["Foreman", "Laborer", "Admin"])},
+            "memberGroup": {"groupName": f"Crew {i % 12}"},
+            "wageHistories": [
+                {
+                    "wage": round(self.rng.uniform(15, 60), 2),
+                    "wageRate": self.rng.choice([10, 30, 40, 50]),
+                    "overburden": round(self.rng.uniform(0, 30), 2),
+                    "effectiveRate": None,
+                    "createdOn": self._timestamp(w * 30),
+                    "updatedOn": self._timestamp(w * 30),
+                    "deletedOn": None,
+                    "changeDate": self._timestamp(w * 30),
+                }
+                for w in range(self.rng.randint(1, 3))
+            ],
+            "isSubContractor": self.rng.random() < 0.1,
+            "timeLocationRequired": self.rng.choice(["YES", "AUTO", "NO"]),
+            "createdOn": self._timestamp(self.rng.randint(0, 100)),
+            "updatedOn": self._timestamp(self.rng.randint(100, 200)),
+            "archivedOn": self._maybe_archived(),
+        }
+
+    def _equipment(self, i: int) -> Dict:
+        return {
+            "id": f"equip-{i}",
+            "equipmentName": f"Equipment {i}",
+            "year": self.rng.randint(1995, 2024),
+            "model": {
+                "id": f"model-{i % 40}",
+                "type": self.rng.choice(["Truck", "Excavator", "Loader"]),
+                "title": f"Model {i % 40}",
+                "unknown": False,
+                "make": {"id": f"make-{i % 9}", "title": f"Make {i % 9}", "unknown": False},
+                "category": {"id": f"cat-{i % 5}", "title": f"Category {i % 5}"},
+            },
+            "lastHours": {"id": f"hours-{i}", "runningHours": self.rng.randint(0, 20000)},
+            "costHistory": [
+                {"id": f"cost-{i}-{c}", "operatorCostRate": round(self.rng.uniform(20, 90), 2),
+                 "createdOn": self._timestamp(c * 60), "deletedOn": None}
+                for c in range(self.rng.randint(1, 3))
+            ],
+            "createdOn": self._timestamp(self.rng.randint(0, 100)),
+            "updatedOn": self._timestamp(self.rng.randint(100, 200)),
+            "deletedOn": self._timestamp(300) if self.rng.random() < self.archived_ratio else None,
+        }
+
+    def _budgets(self, cost_codes_per_project: int) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        hours, costs, progress = [], [], []
+        for project in self.projects:
+            project_codes = [None] + [cc["id"] for cc in self.rng.sample(
+                self.cost_codes, min(cost_codes_per_project, len(self.cost_codes)))]
+            for cc_id in project_codes:
+                suffix = f"{project['id']}-{cc_id}"
+                created_on = self._timestamp(self.rng.randint(0, 200))
+                hours.append({
+                    "id": f"bh-{suffix}", "projectId": project["id"], "memberId": None,
+                    "budgetSeconds": self.rng.randint(0, 360000), "costCodeId": cc_id, "equipmentId": None,
+                    "createdOn": created_on, "equipmentBudgetSeconds": None,
+                })
+                costs.append({
+                    "id": f"bc-{suffix}", "projectId": project["id"], "memberId": None,
+                    "costBudget": round(self.rng.uniform(0, 50000), 2), "costCodeId": cc_id,
+                    "equipmentId": None, "equipmentCostBudget": None, "createdOn": created_on,
+                })
+                if cc_id:
+                    progress.append({
+                        "id": f"pb-{suffix}", "projectId": project["id"], "costCodeId": cc_id,
+                        "quantity": self.rng.randint(0, 100), "value": round(self.rng.uniform(0, 10000), 2),
+                        "createdOn": created_on, "deletedOn": None,
+                    })
+        return hours, costs, progress
+
+    def collection(self, field: str) -> List[Dict]:
+        return {
+            "projects": self.projects,
+            "budgetHours": self.budget_hours,
+            "budgetCosts": self.budget_costs,
+            "progressBudgets": self.progress_budgets,
+            "costCodes": self.cost_codes,
+            "members": self.members,
+            "equipment": self.equipment,
+        }[field]
+
+
+def _resolve(record: Dict, path: List[str]) -> Any:
+    value: Any = record
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+_OPERATORS = {"isNull", "equal", "contains", "greaterThan", "greaterThanOrEqual", "lessThan"}
+
+
+def _has(record: Dict, path: List[str]) -> bool:
+    value: Any = record
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return False
+        value = value[key]
+    return True
+
+
+def _matches(record: Dict, filter_: Optional[Dict], path: Tuple[str, ...] = ()) -> bool:
+    """Apply the subset of BusyBusy filter operators the services use"""
+    for key, condition in (filter_ or {}).items():
+        if not isinstance(condition, dict):
+            continue
+        field_path = [*path, key]
+
+        if not _OPERATORS & condition.keys():
+            # Nested object filter such as projectInfo: {...}
+            if isinstance(_resolve(record, field_path), dict) and not _matches(record, condition, tuple(field_path)):
+                return False
+            continue
+
+        if not _has(record, field_path):
+            continue  # Fields the fake does not model (isLatest, permissions, ...)
+
+        value = _resolve(record, field_path)
+        if "isNull" in condition and (value is None) != bool(condition["isNull"]):
+            return False
+        if "equal" in condition and value != condition["equal"]:
+            return False
+        if "contains" in condition and value not in condition["contains"]:
+            return False
+        if "greaterThan" in condition and not (value is not None and value > condition["greaterThan"]):
+            return False
+        if "greaterThanOrEqual" in condition and not (value is not None and value >= condition["greaterThanOrEqual"]):
+            return False
+        if "lessThan" in condition and not (value is not None and value < condition["lessThan"]):
+            return False
+    return True
+
+
+def _sort(records: List[Dict], sort: Optional[List[Dict]]) -> List[Dict]:
+    result = list(records)
+    for spec in reversed(sort or []):
+        path, direction = [], spec
+        while isinstance(direction, dict):
+            key, direction = next(iter(direction.items()))
+            path.append(key)
+        result.sort(key=lambda r: (_resolve(r, path) is None, _resolve(r, path) or ''),
+                    reverse=direction == "desc")
+    return result
+
+
+_FIELD_RE = re.compile(r'\s*(?:(\w+)\s*:\s*)?(\w+)\s*(\(([^)]*)\))?\s*')
+_ARG_RE = re.compile(r'(\w+)\s*:\s*\$(\w+)')
+
+
+def parse_root_fields(query: str) -> List[Dict]:
+    """Find the (aliased) root fields of the operation with their variable bindings"""
+    start = query.index('{')
+    fields, pos, depth = [], start + 1, 1
+    while pos < len(query) and depth > 0:
+        char = query[pos]
+        if char == '}':
+            depth -= 1
+            pos += 1
+        elif depth == 1 and (char.isalpha() or char == '_'):
+            match = _FIELD_RE.match(query, pos)
+            alias, name, args = match.group(1), match.group(2), match.group(4) or ''
+            pos = match.end()
+            selection = ''
+            if pos < len(query) and query[pos] == '{':
+                inner_depth, end = 0, pos
+                while True:
+                    if query[end] == '{':
+                        inner_depth += 1
+                    elif query[end] == '}':
+                        inner_depth -= 1
+                        if inner_depth == 0:
+                            break
+                    end += 1
+                selection = query[pos:end + 1]
+                pos = end + 1
+            fields.append({
+                "alias": alias or name,
+                "name": name,
+                "args": dict(_ARG_RE.findall(args)),
+                "selection": selection,
+            })
+        else:
+            if char == '{':
+                depth += 1
+            pos += 1
+    return fields
+
+
+class FakeGraphQL:
+    def __init__(self, tenant: TenantData, latency_ms: float = 0.0, per_record_us: float = 0.0):
+        self.tenant = tenant
+        self.latency_ms = latency_ms
+        self.per_record_us = per_record_us
+        self.stats: Counter = Counter()
+
+    def _project_output(self, project: Dict, child_levels: int, with_ancestors: bool) -> Dict:
+        output = dict(project)
+        if child_levels > 0:
+            output["children"] = [
+                self._project_output(child, child_levels - 1, False)
+                for child in self.tenant.children.get(project["id"], [])
+            ]
+        if with_ancestors:
+            output["ancestors"] = self.tenant.ancestors(project)
+        return output
+
+    def resolve(self, field: Dict, variables: Dict) -> List[Dict]:
+        args = {name: variables.get(var) for name, var in field["args"].items()}
+        records = [r for r in self.tenant.collection(field["name"]) if _matches(r, args.get("filter"))]
+        records = _sort(records, args.get("sort"))
+
+        offset = int(args["after"]) if args.get("after") else 0
+        first = args.get("first")
+        page = records[offset:offset + first] if first else records[offset:]
+
+        child_levels = field["selection"].count("children")
+        with_ancestors = "ancestors" in field["selection"]
+        result = []
+        for index, record in enumerate(page, start=offset + 1):
+            output = (self._project_output(record, child_levels, with_ancestors)
+                      if field["name"] == "projects" else dict(record))
+            output["cursor"] = str(index)
+            result.append(output)
+        return result
+
+    async def graphql(self, request: Request) -> Response:
+        body = orjson.loads(await request.body())
+        variables = body.get("variables") or {}
+        fields = parse_root_fields(body["query"])
+
+        data, records = {}, 0
+        for field in fields:
+            self.stats[field["name"]] += 1
+            data[field["alias"]] = self.resolve(field, variables)
+            records += len(data[field["alias"]])
+        self.stats["requests"] += 1
+
+        delay = self.latency_ms / 1000 + records * self.per_record_us / 1e6
+        if delay:
+            await asyncio.sleep(delay)
+        return Response(orjson.dumps({"data": data}), media_type="application/json")
+
+    async def head(self, request: Request) -> Response:
+        return Response(status_code=200)
+
+    async def get_stats(self, request: Request) -> Response:
+        return Response(orjson.dumps(dict(self.stats)), media_type="application/json")
+
+    async def reset_stats(self, request: Request) -> Response:
+        self.stats.clear()
+        return Response(status_code=204)
+
+
+def create_app(tenant: TenantData, latency_ms: float = 0.0, per_record_us: float = 0.0) -> Starlette:
+    fake = FakeGraphQL(tenant, latency_ms, per_record_us)
+    app = Starlette(routes=[
+        Route("/", fake.graphql, methods=["POST"]),
+        Route("/", fake.head, methods=["HEAD", "GET"]),
+        Route("/__stats", fake.get_stats, methods=["GET"]),
+        Route("/__reset", fake.reset_stats, methods=["POST"]),
+    ])
+    app.state.fake = fake
+    return app
+
+
+def add_tenant_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--roots', type=int, default=200, help='Root projects')
+    parser.add_argument('--children', type=int, default=3, help='Max children per project')
+    parser.add_argument('--max-depth', type=int, default=3, help='Project tree depth (max 7)')
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--cost-codes', type=int, default=200)
+    parser.add_argument('--equipment', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Fixed latency per request')
+    parser.add_argument('--per-record-us', type=float, default=5.0, help='Extra latency per returned record')
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def tenant_from_args(args: argparse.Namespace) -> TenantData:
+    return TenantData(
+        roots=args.roots, children_per_project=args.children, max_depth=args.max_depth,
+        members=args.members, cost_codes=args.cost_codes, equipment=args.equipment, seed=args.seed
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_tenant_arguments(parser)
+    args = parser.parse_args()
+
+    tenant = tenant_from_args(args)
+    print(f"Fake tenant: {len(tenant.projects)} projects, {len(tenant.budget_hours)} budget hours, "
+          f"{len(tenant.members)} members, {len(tenant.cost_codes)} cost codes, "
+          f"{len(tenant.equipment)} equipment", flush=True)
+    uvicorn.run(create_app(tenant, args.latency_ms, args.per_record_us),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == '__main__':
+    main()
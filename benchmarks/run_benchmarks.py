@@ -0,0 +1,181 @@
+"""End-to-end benchmark of the /api/* endpoints against the fake upstream.
+
+Usage:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --roots 2000 --requests 20 --concurrency 4 --format ndjson
+
+Starts benchmarks.fake_graphql and the API (one uvicorn worker) as
+subprocesses, drives every endpoint and reports latency percentiles,
+upstream requests per API request and the API process' peak RSS while
+that endpoint ran. The API uses the Redis configured in the environment
+(REDIS_HOST/REDIS_PORT); pass --redis-db to isolate it and --flush-redis
+to start from an empty cache. Upstream calls are paced by the API's rate
+limiter; set UPSTREAM_RATE_LIMIT_PER_SECOND=0 to measure without it.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from .fake_graphql import add_tenant_arguments
+
+API_KEY = "benchmark-api-key-0123456789"
+
+ENDPOINTS = {
+    "projects": ("/api/projects", {"is_archived": "false", "timezone": "GMT+00:00"}),
+    "budgets": ("/api/budgets", {"is_archived": "false"}),
+    "employees": ("/api/employees", {"is_archived": "false", "timezone": "GMT+00:00"}),
+    "cost-codes": ("/api/cost-codes", {"is_archived": "false", "timezone": "GMT+00:00"}),
+    "equipment": ("/api/equipment", {"is_deleted": "false", "timezone": "GMT+00:00"}),
+}
+
+
+def _rss_kb(pid: int) -> Optional[int]:
+    """Current resident set size of a process (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _wait_until_up(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def _sample_rss(pid: int, peak: Dict[str, int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        rss = _rss_kb(pid)
+        if rss is not None:
+            peak["kb"] = max(peak.get("kb", 0), rss)
+        await asyncio.sleep(0.05)
+
+
+async def run_endpoint(name: str, api_url: str, upstream_url: str, api_pid: int,
+                       requests: int, concurrency: int, output_format: str) -> Dict:
+    path, params = ENDPOINTS[name]
+    params = {**params, "format": output_format}
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        await client.post(f"{upstream_url}/__reset")
+
+        async def one_request():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"{api_url}{path}", params=params,
+                                            headers={"key-authorization": API_KEY})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        peak: Dict[str, int] = {}
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(_sample_rss(api_pid, peak, stop))
+        await asyncio.gather(*[one_request() for _ in range(requests)])
+        stop.set()
+        await sampler
+
+        stats = (await client.get(f"{upstream_url}/__stats")).json()
+
+    return {
+        "endpoint": name,
+        "p50": _percentile(latencies, 50),
+        "p90": _percentile(latencies, 90),
+        "p99": _percentile(latencies, 99),
+        "upstream": stats.get("requests", 0),
+        "errors": errors,
+        "peak_rss_mb": peak["kb"] / 1024 if peak else None,
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+
+    tenant_args = [
+        "--roots", str(args.roots), "--children", str(args.children), "--max-depth", str(args.max_depth),
+        "--members", str(args.members), "--cost-codes", str(args.cost_codes),
+        "--equipment", str(args.equipment), "--latency-ms", str(args.latency_ms),
+        "--per-record-us", str(args.per_record_us), "--seed", str(args.seed),
+    ]
+    upstream = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_graphql", "--port", str(args.upstream_port)] + tenant_args
+    )
+
+    env = {**os.environ, "BUSYBUSY_GRAPHQL_URL": f"{upstream_url}/"}
+    if args.redis_db is not None:
+        env["REDIS_DB"] = str(args.redis_db)
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.api_port),
+         "--log-level", "warning"],
+        env=env
+    )
+
+    try:
+        await _wait_until_up(f"{upstream_url}/__stats")
+        await _wait_until_up(f"{api_url}/")
+
+        if args.flush_redis:
+            import redis
+            redis.Redis(
+                host=env.get("REDIS_HOST", "localhost"), port=int(env.get("REDIS_PORT", 6379)),
+                db=int(env.get("REDIS_DB", 0))
+            ).flushdb()
+
+        print(f"{'endpoint':<12} {'p50 (s)':>9} {'p90 (s)':>9} {'p99 (s)':>9} "
+              f"{'upstream':>9} {'errors':>7} {'peak RSS (MB)':>14}")
+        for name in args.endpoints.split(","):
+            result = await run_endpoint(name, api_url, upstream_url, api.pid,
+                                        args.requests, args.concurrency, args.format)
+            rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "n/a"
+            print(f"{result['endpoint']:<12} {result['p50']:>9.3f} {result['p90']:>9.3f} "
+                  f"{result['p99']:>9.3f} {result['upstream']:>9} {result['errors']:>7} {rss:>14}")
+    finally:
+        api.terminate()
+        upstream.terminate()
+        api.wait()
+        upstream.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', default=",".join(ENDPOINTS), help='Comma-separated endpoint names')
+    parser.add_argument('--requests', type=int, default=10, help='Requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--format', default='json', help='json, ndjson, json-stream or table')
+    parser.add_argument('--api-port', type=int, default=8001)
+    parser.add_argument('--upstream-port', type=int, default=8765)
+    parser.add_argument('--redis-db', type=int, default=None)
+    parser.add_argument('--flush-redis', action='store_true', help='FLUSHDB the API Redis database first')
+    add_tenant_arguments(parser)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
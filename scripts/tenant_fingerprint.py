@@ -0,0 +1,29 @@
+"""Print the cache fingerprint of an API key.
+
+Usage:
+    python -m scripts.tenant_fingerprint
+    python -m scripts.tenant_fingerprint --api-key <api key>
+
+The fingerprint names the tenant's cache keys (tenant:<fingerprint>:...)
+and keys its entry in TENANT_CACHE_OVERRIDES. It depends on
+CACHE_KEY_SALT, so run this with the same environment as the API.
+Without --api-key the key is prompted for, keeping it out of the shell
+history.
+"""
+import argparse
+import getpass
+
+from app.utils.tenant_cache import tenant_fingerprint
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-key", help="BusyBusy API key (prompted for when omitted)")
+    args = parser.parse_args()
+
+    api_key = args.api_key or getpass.getpass("API key: ")
+    print(tenant_fingerprint(api_key.strip()))
+
+
+if __name__ == "__main__":
+    main()